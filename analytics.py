@@ -0,0 +1,105 @@
+# Sales analytics over the order history: revenue, units, top products, category
+# mix, per-user and per-hour sales. Orders past the modify window can no longer
+# change, so they are folded once into per-day rollups (sales_rollups.json);
+# a report merges the rollups it needs with one streaming pass over the few
+# orders placed since. All money is summed in integer cents.
+import csv
+import storage, pricing
+
+ROLLUPS_FILE = "sales_rollups.json"
+EXPORTS = {"day": "days", "product": "products", "category": "categories", "user": "users", "hour": "hours"}
+
+def new_day():
+    return {"orders": 0, "revenue": 0, "subtotal": 0, "tax": 0, "discount": 0, "units": 0,
+            "products": {}, "users": {}, "hours": {}}
+
+def add_order(day, o):
+    cents = pricing.to_cents(o.get("total", 0))
+    day["orders"] += 1; day["revenue"] += cents
+    for f in ("subtotal", "tax", "discount"): day[f] += pricing.to_cents(o.get(f, 0))
+    for i in o.get("products", []):
+        p = day["products"].setdefault(i["name"], [0, 0])
+        p[0] += i["quantity"]; p[1] += pricing.to_cents(i["price"]) * i["quantity"]
+        day["units"] += i["quantity"]
+    for table, k in ((day["users"], o.get("username", "")), (day["hours"], o["timestamp"][11:13])):
+        t = table.setdefault(k, [0, 0]); t[0] += 1; t[1] += cents
+
+def merge(dst, src):
+    for k, v in src.items():
+        if isinstance(v, dict):
+            table = dst[k]
+            for name, (a, b) in v.items():
+                t = table.setdefault(name, [0, 0]); t[0] += a; t[1] += b
+        else: dst[k] += v
+
+class Rollups:
+    """Per-day totals of every order with a timestamp up to `through`."""
+    def __init__(self, data=None):
+        data = data or {}
+        self.through = data.get("through", "")
+        self.days = data.get("days", {})
+
+    @classmethod
+    def load(cls, path=ROLLUPS_FILE):
+        data = storage.read_json(path)
+        return cls(data if isinstance(data, dict) else None)
+
+    def save(self, path=ROLLUPS_FILE): storage.write_json(path, {"through": self.through, "days": self.days})
+
+    def close(self, orders, cutoff):
+        """Fold orders stamped after `through` and up to `cutoff` into the rollups. Returns
+        (number folded, orders left open). Timestamps compare as text."""
+        folded, open_orders = 0, []
+        for o in orders:
+            ts = o["timestamp"]
+            if ts <= self.through: continue
+            if ts > cutoff: open_orders.append(o); continue
+            add_order(self.days.setdefault(ts[:10], new_day()), o); folded += 1
+        if folded: self.through = max(self.through, cutoff)
+        return folded, open_orders
+
+def build_report(rollups, open_orders, start=None, end=None, categories=None):
+    """Report for dates start..end (inclusive, 'YYYY-MM-DD'; None = unbounded) from the
+    rollups plus orders not yet rolled up. `categories` maps name_key -> category."""
+    def wanted(d): return (start is None or d >= start) and (end is None or d <= end)
+    days = {d: r for d, r in rollups.days.items() if wanted(d)}
+    live = {}
+    for o in open_orders:
+        d = o["timestamp"][:10]
+        if wanted(d): add_order(live.setdefault(d, new_day()), o)
+    for d, r in live.items():
+        if d in days: merged = new_day(); merge(merged, days[d]); merge(merged, r); days[d] = merged
+        else: days[d] = r
+    total = new_day()
+    for r in days.values(): merge(total, r)
+
+    money = pricing.to_amount
+    cats = {}
+    for name, (units, cents) in total["products"].items():
+        c = (categories or {}).get(storage.name_key(name)) or "Uncategorized"
+        t = cats.setdefault(c, [0, 0]); t[0] += units; t[1] += cents
+    def table(items, key, count): return [{key: k, count: a, "revenue": money(b)} for k, (a, b) in items]
+    products = sorted(total["products"].items(), key=lambda kv: (-kv[1][1], kv[0]))
+    gross = total["subtotal"] or 1
+    return {
+        "from": min(days, default=None), "to": max(days, default=None),
+        "orders": total["orders"], "units": total["units"], "revenue": money(total["revenue"]),
+        "subtotal": money(total["subtotal"]), "tax": money(total["tax"]), "discount": money(total["discount"]),
+        "average_order": money(total["revenue"] // total["orders"]) if total["orders"] else 0.0,
+        "products": table(products, "name", "units"),
+        "categories": [dict(row, share=round(100 * pricing.to_cents(row["revenue"]) / gross, 1))
+                       for row in table(sorted(cats.items(), key=lambda kv: -kv[1][1]), "category", "units")],
+        "users": table(sorted(total["users"].items(), key=lambda kv: -kv[1][1]), "user", "orders"),
+        "hours": table(sorted(total["hours"].items()), "hour", "orders"),
+        "days": [{"date": d, "orders": days[d]["orders"], "units": days[d]["units"], "revenue": money(days[d]["revenue"])}
+                 for d in sorted(days)],
+    }
+
+def write_report(path, report, by="day"):
+    """JSON gets the whole report; CSV gets one table (by day, product, category, user or hour)."""
+    if path.lower().endswith(".json"):
+        storage.write_json(path, report); return
+    rows = report[EXPORTS[by]]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ["date"])
+        w.writeheader(); w.writerows(rows)
@@ -0,0 +1,83 @@
+# Headless bulk checkout: stream orders from a JSONL or CSV file and commit
+# them in batches through order.CheckoutTransaction (one save per batch).
+#
+# JSONL: one order per line
+#   {"username": "admin", "products": [{"name": "Milk", "quantity": 4}], "discount": true}
+# CSV: one product line per row; consecutive rows with the same order_ref form one order
+#   order_ref,username,name,quantity,discount
+import csv, json, os
+import inventory, order
+
+def read_orders(path, username=None):
+    """Yield {"ref", "username", "products", "discount"} dicts without loading the whole file.
+    A record that cannot be read yields {"ref", "error"} instead."""
+    if os.path.splitext(path)[1].lower() == ".csv":
+        yield from _read_csv(path, username); return
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip(): continue
+            try: rec = json.loads(line)
+            except ValueError as e: yield {"ref": n, "error": f"Invalid JSON: {e}"}; continue
+            if not isinstance(rec, dict): yield {"ref": n, "error": "Not an order object"}; continue
+            yield {"ref": rec.get("ref", n), "username": rec.get("username") or username,
+                   "products": rec.get("products", []), "discount": rec.get("discount")}
+
+def _read_csv(path, username):
+    current = None
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for n, row in enumerate(csv.DictReader(f), 2):
+            ref = row.get("order_ref") or row.get("ref")
+            if current and current["ref"] != ref:
+                yield current; current = None
+            if current is None:
+                disc = (row.get("discount") or "").strip().lower()
+                current = {"ref": ref, "username": row.get("username") or username, "products": [],
+                           "discount": disc in ("1", "y", "yes", "true") if disc else None}
+            if not row.get("name") or not row.get("quantity"): current.setdefault("error", f"Line {n}: name and quantity are required")
+            else: current["products"].append({"name": row["name"], "quantity": row["quantity"]})
+    if current: yield current
+
+def build_cart(products):
+    """Attach current prices; raises order.CheckoutInputError for unknown products or bad quantities."""
+    cart = []
+    if not isinstance(products, list): raise order.CheckoutInputError("products must be a list")
+    for item in products:
+        if not isinstance(item, dict): raise order.CheckoutInputError("Each product must be an object")
+        p = inventory.store.get(str(item.get("name", "")))
+        if not p: raise order.CheckoutInputError(f"Unknown product: {item.get('name')}")
+        try: qty = inventory.whole_number(item.get("quantity", 0))
+        except (TypeError, ValueError): raise order.CheckoutInputError(f"Invalid quantity for {p['name']}")
+        cart.append({'name': p['name'], 'price': p['price'], 'quantity': qty})
+    return cart
+
+def import_orders(path, username=None, batch_size=500, apply_discount=False, on_batch=None):
+    """Validate and check out every order in `path`. Orders failing validation are skipped
+    and reported; the rest are committed `batch_size` at a time. Returns a summary dict."""
+    order.sweep_expired(); inventory.load_data()
+    summary = {"committed": 0, "rejected": []}
+    tx = order.CheckoutTransaction(); refs = []
+    for rec in read_orders(path, username):
+        try:
+            if "error" in rec: raise order.CheckoutError(rec["error"])
+            if not rec["username"]: raise order.CheckoutError("Missing username")
+            if not rec["products"]: raise order.CheckoutError("Empty order")
+            disc = apply_discount if rec["discount"] is None else rec["discount"]
+            tx.add(rec["username"], build_cart(rec["products"]), disc)
+            refs.append(rec["ref"])
+        except order.CheckoutError as e:
+            summary["rejected"].append({"ref": rec["ref"], "error": str(e)}); continue
+        if len(tx.staged) >= batch_size:
+            _commit(tx, refs, summary, on_batch)
+    _commit(tx, refs, summary, on_batch)
+    return summary
+
+def _commit(tx, refs, summary, on_batch):
+    if not tx.staged: return
+    try:
+        summary["committed"] += len(tx.commit())
+    except order.CheckoutError as e:
+        # stock changed under us (another till): reject the whole batch, keep going
+        summary["rejected"].extend({"ref": ref, "error": str(e)} for ref in refs)
+        tx.rollback()
+    refs.clear()
+    if on_batch: on_batch(summary)
@@ -0,0 +1,117 @@
+# Headless benchmarks for the inventory, ordering and persistence hot paths.
+# Generates synthetic catalogs and order histories in a scratch directory and
+# prints (or writes) machine-readable JSON so runs can be compared across commits.
+#
+#   python benchmark.py --products 1000 100000 --orders 10000 --repeat 3 --output bench.json
+#   HAMI_STORAGE=sqlite python benchmark.py --products 10000
+import argparse, contextlib, io, json, os, platform, random, shutil, subprocess, sys, tempfile, time
+from datetime import datetime, timedelta
+
+CATEGORIES = ["Fruit", "Vegetable", "Dairy", "Bakery", "Drinks", "Snacks", "Frozen", "Household"]
+
+def make_products(n, rng):
+    return [{"name": f"Product {i:07d}", "category": rng.choice(CATEGORIES),
+             "price": round(rng.uniform(0.2, 50), 2), "quantity": rng.randint(1000, 100000)} for i in range(n)]
+
+def make_orders(n, products, rng, expired_share=0.9):
+    """Order history; `expired_share` of the orders are older than the modify window."""
+    now = datetime.now()
+    out = []
+    for i in range(1, n + 1):
+        age = timedelta(days=rng.uniform(0.1, 365)) if rng.random() < expired_share else timedelta(minutes=rng.uniform(0, 30))
+        ts = (now - age).strftime("%Y-%m-%d %H:%M:%S")
+        lines = [{"name": p["name"], "price": p["price"], "quantity": rng.randint(1, 5)}
+                 for p in rng.sample(products, min(len(products), rng.randint(1, 6)))]
+        sub = sum(l["price"] * l["quantity"] for l in lines)
+        out.append({"order_id": f"ORD_{i:03d}", "username": rng.choice(["admin", "till1", "till2"]), "products": lines,
+                    "subtotal": sub, "tax": sub * 0.05, "discount": 0.0, "total": sub * 1.05, "timestamp": ts,
+                    "receipt_file": f"receipt_bench_{i}.txt"})
+    return out
+
+def timed(fn, repeat, setup=None):
+    runs = []
+    for _ in range(repeat):
+        if setup: setup()
+        start = time.perf_counter(); fn(); runs.append(time.perf_counter() - start)
+    return {"best": min(runs), "mean": sum(runs) / len(runs), "runs": len(runs)}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run_size(n_products, n_orders, repeat, lookups, rng):
+    import inventory, order, storage
+    products = make_products(n_products, rng)
+    history = make_orders(n_orders, products, rng)
+
+    def reset():
+        # fresh files (and a fresh database in sqlite mode) for every measured run
+        storage.backend.erase([inventory.INVENTORY_FILE, order.ORDERS_FILE]); order.order_archive.erase()
+        storage.write_records(inventory.INVENTORY_FILE, products)
+        storage.write_records(order.ORDERS_FILE, history)
+        if isinstance(storage.backend, storage.SqliteBackend):
+            storage.import_json(inventory.INVENTORY_FILE, order.ORDERS_FILE, "users.json")
+        inventory.load_data(); order.load_orders()
+
+    reset()
+    names = [p["name"].upper() for p in rng.sample(products, min(lookups, n_products))]
+    orders = order.load_orders()
+    cart = [{"name": p["name"], "price": p["price"], "quantity": 1} for p in products[:40]]
+    def checkout():
+        tx = order.CheckoutTransaction(); tx.add("bench", cart); tx.commit()
+    def save():
+        inventory.log_change("stock", name=products[0]["name"], quantity=products[0]["quantity"]); inventory.save_data()
+
+    results = {
+        "load_data": timed(inventory.load_data, repeat),
+        "save_data": timed(save, repeat),
+        "load_orders": timed(lambda: (order.cache.invalidate(), order.load_orders()), repeat),
+        "load_orders_cached": timed(order.load_orders, repeat),
+        "next_order_id": timed(lambda: order.next_order_id(orders), repeat),
+        "allocate_1000_order_ids": timed(lambda: order.allocate_order_ids(1000, orders), repeat),
+        "name_lookup": timed(lambda: [inventory.store.get(n) for n in names], repeat),
+        "search_product": timed(lambda: inventory.find_products("product 00012"), repeat),
+        "checkout_40_lines": timed(checkout, repeat, setup=reset),
+        "cleanup_expired_orders": timed(order.sweep_expired, repeat, setup=reset),
+    }
+    order.receipts.flush()
+    return [dict(op=op, products=n_products, orders=n_orders, **r) for op, r in results.items()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time inventory, ordering and persistence hot paths on synthetic data.")
+    parser.add_argument("--products", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--orders", type=int, nargs="+", default=[1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--lookups", type=int, default=10000, help="names looked up per name_lookup run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, here)
+    scratch = tempfile.mkdtemp(prefix="hami_bench_")
+    cwd = os.getcwd(); os.chdir(scratch)
+    rng = random.Random(args.seed)
+    results = []
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for n_products in args.products:
+                for n_orders in args.orders:
+                    results += run_size(n_products, n_orders, args.repeat, args.lookups, rng)
+    finally:
+        os.chdir(cwd); shutil.rmtree(scratch, ignore_errors=True)
+    report = {"meta": {"commit": git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+                       "storage": os.environ.get("HAMI_STORAGE", "json"), "journal": os.environ.get("HAMI_JOURNAL", "0"),
+                       "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")},
+              "results": results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f: f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
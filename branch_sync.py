@@ -0,0 +1,184 @@
+# Multi-branch replication. With HAMI_BRANCH=<id> set, every inventory and order
+# change this copy saves is also appended, tagged with the branch ID and a
+# per-branch sequence number, to the branch's replication log in a directory
+# shared by all branches (HAMI_SYNC_DIR, default "sync"):
+#
+#   sync/<branch>.log   {"branch": "north", "seq": 42, "ts": "...", "op": "stock", "name": "Milk", "quantity": 12, "delta": -2}
+#
+# Each log is only ever appended to by its own branch. `python main.py sync` reads
+# every log from where the previous sync stopped (a byte offset per branch), so
+# only new records are transferred, and folds them into a consolidated view
+# (consolidated.json), which is what head office looks at:
+#   - stock is a counter per product with one entry per branch, set from that
+#     branch's records in sequence order; the product's total is their sum;
+#   - name, category and price are each last-writer-wins by (timestamp, branch, seq)
+#     of the records that set them (a rename record sets all three);
+#   - open orders are kept per branch and folded into per-branch daily sales
+#     (see analytics.py) once they are archived; cancelled orders are dropped.
+# Every branch's records are applied in its own order and branches never
+# overwrite each other's entries, so any copy that has read the same logs holds
+# the same view, whatever order the logs were read in; `sync --verify` checks this
+# by folding every log from scratch in both orders.
+import csv, json, os
+from datetime import datetime
+import storage, journal, analytics, pricing
+
+BRANCH = os.environ.get("HAMI_BRANCH", "").strip()
+SYNC_DIR = os.environ.get("HAMI_SYNC_DIR", "sync")
+VIEW_FILE = "consolidated.json"
+
+_outbox = None   # (size, last seq) of our log after our last append
+
+def log_path(branch): return os.path.join(SYNC_DIR, f"{branch}.log")
+
+def _last_seq(path):
+    """Sequence number of the last complete record in a log (0 if there is none)."""
+    if not os.path.exists(path): return 0
+    with open(path, "rb") as f:
+        f.seek(0, 2); f.seek(max(0, f.tell() - 65536))
+        lines = f.read().split(b"\n")
+    for line in reversed(lines):
+        try: return json.loads(line)["seq"]
+        except (ValueError, KeyError): continue
+    return 0
+
+def publish(records, baseline=False):
+    """Append saved change records (inventory.log_change / order.log_order) to this
+    branch's log. Does nothing unless HAMI_BRANCH is set. Baseline records carry an
+    empty timestamp, so they never win over a real edit made at another branch."""
+    global _outbox
+    if not BRANCH or not records: return
+    with storage.locked():
+        path = log_path(BRANCH)
+        os.makedirs(SYNC_DIR, exist_ok=True)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        seq = _outbox[1] if _outbox and _outbox[0] == size else _last_seq(path)
+        ts = "" if baseline else datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        lines = []
+        for rec in records:
+            seq += 1; lines.append(json.dumps(dict(rec, branch=BRANCH, seq=seq, ts=ts), ensure_ascii=False))
+        with open(path, "a+b") as f:
+            if size:
+                f.seek(size - 1)
+                if f.read(1) != b"\n": f.write(b"\n")  # cut off a torn record so it stays one bad line
+            f.write(("\n".join(lines) + "\n").encode("utf-8"))
+            f.flush(); os.fsync(f.fileno())
+            _outbox = (f.tell(), seq)
+
+def bootstrap(products, orders):
+    """First run in branch mode: publish the current stock and open orders once, so
+    the view starts from what this branch already holds."""
+    if BRANCH and not os.path.exists(log_path(BRANCH)):
+        publish([{"op": "add", "product": dict(p)} for p in products] + [{"op": "order_create", "order": o} for o in orders], baseline=True)
+
+# ------------------ Consolidated view ------------------
+FIELDS = ("name", "category", "price")
+
+def load_view(path=VIEW_FILE):
+    data = storage.read_json(path) if path else None
+    view = data if isinstance(data, dict) else {}
+    for k in ("sources", "products", "open_orders", "sales"): view.setdefault(k, {})
+    for entry in view["products"].values():
+        if "stamp" in entry:  # written before fields were stamped one by one
+            stamp = entry.pop("stamp"); entry["stamps"] = {f: stamp for f in FIELDS if stamp is not None}
+    return view
+
+def _set_product(view, branch, rec, product, quantity=0):
+    entry = view["products"].setdefault(storage.name_key(product["name"]),
+                                        {"name": product["name"], "category": "", "price": 0.0, "stamps": {}, "stock": {}})
+    stamp = [rec["ts"], branch, rec["seq"]]
+    for f in FIELDS:
+        if f in product and (f not in entry["stamps"] or stamp > entry["stamps"][f]):
+            entry[f] = float(product[f]) if f == "price" else product[f]; entry["stamps"][f] = stamp
+    entry["stock"][branch] = int(product.get("quantity", quantity))
+
+def _drop_stock(view, branch, name):
+    entry = view["products"].get(storage.name_key(name))
+    return entry["stock"].pop(branch, None) if entry else None
+
+def _apply(view, branch, rec):
+    op = rec["op"]
+    if op == "add": _set_product(view, branch, rec, rec["product"])
+    elif op == "update":  # only the changed fields (all of them for a rename)
+        fields = dict(rec["product"], name=rec["product"].get("name", rec["name"]))
+        _set_product(view, branch, rec, fields, _drop_stock(view, branch, rec["name"]) or 0)
+    elif op == "delete": _drop_stock(view, branch, rec["name"])
+    elif op == "stock":
+        entry = view["products"].get(storage.name_key(rec["name"]))
+        if entry: entry["stock"][branch] = rec["quantity"]
+    elif op in ("order_create", "order_modify"): view["open_orders"][f"{branch}/{rec['order']['order_id']}"] = rec["order"]
+    elif op == "order_delete":
+        o = view["open_orders"].pop(f"{branch}/{rec['order_id']}", None)
+        if o and rec.get("archived"):
+            analytics.add_order(view["sales"].setdefault(branch, {}).setdefault(o["timestamp"][:10], analytics.new_day()), o)
+    elif op == "reset":  # the branch erased all its data
+        for entry in view["products"].values(): entry["stock"].pop(branch, None)
+        view["open_orders"] = {k: o for k, o in view["open_orders"].items() if not k.startswith(branch + "/")}
+
+def _branches():
+    return sorted(n[:-4] for n in os.listdir(SYNC_DIR) if n.endswith(".log")) if os.path.isdir(SYNC_DIR) else []
+
+def _read_new(view, branch):
+    """Apply the records a branch has added to its log since the view last read it;
+    returns how many were applied."""
+    src = view["sources"].setdefault(branch, {"offset": 0, "seq": 0})
+    with open(log_path(branch), "rb") as f:
+        f.seek(src["offset"]); data = f.read()
+    end = data.rfind(b"\n") + 1   # a record still being written is read next time
+    n = 0
+    for line in data[:end].splitlines():
+        try: rec = json.loads(line)
+        except ValueError: continue
+        if rec.get("seq", 0) <= src["seq"]: continue
+        _apply(view, branch, rec); src["seq"] = rec["seq"]; n += 1
+    src["offset"] += end
+    return n
+
+def sync(path=VIEW_FILE):
+    """Fold every branch's records added since the last sync into the view.
+    Returns {branch: number of records applied}."""
+    applied = {}
+    with storage.locked():
+        view = load_view(path)
+        for branch in _branches():
+            n = _read_new(view, branch)
+            if n: applied[branch] = n
+        if applied: journal.write_snapshot(path, view)
+    return applied
+
+def verify(path=VIEW_FILE):
+    """Fold every log from scratch, reading the branches in name order and in reverse,
+    and compare the two views with each other and with the saved view (if it has read
+    the same records). Returns the parts that differ (products, open_orders, sales);
+    empty if the view does not depend on the order the logs were read in."""
+    with storage.locked():
+        branches, views = _branches(), (load_view(None), load_view(None))
+        for b in branches: _read_new(views[0], b)
+        for b in reversed(branches): _read_new(views[1], b)
+        saved = load_view(path)
+        others = [views[1]] + ([saved] if saved["sources"] == views[0]["sources"] else [])
+    return [k for k in ("products", "open_orders", "sales") if any(v[k] != views[0][k] for v in others)]
+
+def stock_rows(view):
+    """Consolidated stock: one row per product held by any branch, with per-branch counts."""
+    rows = [{"name": e["name"], "category": e["category"], "price": e["price"], "total": sum(e["stock"].values()),
+             "branches": dict(sorted(e["stock"].items()))} for e in view["products"].values() if e["stock"]]
+    return sorted(rows, key=lambda r: storage.name_key(r["name"]))
+
+def sales_rows(view):
+    """Orders and revenue per branch: archived sales plus orders still open."""
+    totals = {}
+    for branch, days in view["sales"].items():
+        t = totals.setdefault(branch, [0, 0])
+        for d in days.values(): t[0] += d["orders"]; t[1] += d["revenue"]
+    for key, o in view["open_orders"].items():
+        t = totals.setdefault(key.split("/", 1)[0], [0, 0]); t[0] += 1; t[1] += pricing.to_cents(o.get("total", 0))
+    return [{"branch": b, "orders": n, "revenue": pricing.to_amount(c)} for b, (n, c) in sorted(totals.items())]
+
+def write_stock(path, rows):
+    if path.lower().endswith(".json"):
+        storage.write_json(path, rows); return
+    branches = sorted({b for r in rows for b in r["branches"]})
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f); w.writerow(["name", "category", "price", "total"] + branches)
+        w.writerows([r["name"], r["category"], r["price"], r["total"]] + [r["branches"].get(b, "") for b in branches] for r in rows)
@@ -0,0 +1,86 @@
+# Bulk inventory import and export in CSV, JSON Lines, JSON or the binary
+# columnar format (chosen by file extension). Import streams the file in chunks,
+# upserts by product name (existing products keep the fields a row leaves blank),
+# reports bad rows instead of stopping, and saves the inventory once at the end.
+#
+# CSV:   name,category,price,quantity   (header row required; extra columns ignored)
+# JSONL: {"name": "Milk", "category": "Dairy", "price": 1.25, "quantity": 40}
+# .bin:  the snapshot layout of columnar.py
+import csv, os
+from itertools import islice
+import inventory, storage, journal, columnar
+
+FIELDS = ("name", "category", "price", "quantity")
+FORMATS = (".csv", ".jsonl", ".json", ".bin")
+CHUNK_SIZE = 2000
+
+def file_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMATS: raise ValueError(f"Unsupported file type {ext or '(none)'}; use {', '.join(FORMATS)}")
+    return ext
+
+def read_products(path):
+    """Yield raw product dicts from `path` one at a time."""
+    ext = file_format(path)
+    if ext == ".csv":
+        with open(path, "r", encoding="utf-8-sig", newline="") as f: yield from csv.DictReader(f)
+    elif ext == ".bin":
+        col, _ = columnar.load_snapshot(path)
+        if col is None: raise ValueError(f"{path} is not an inventory snapshot")
+        try: yield from col.rows()
+        finally: col.close()
+    else: yield from storage.iter_records(path)
+
+def write_products(path, rows):
+    """Write products to `path` in the format named by its extension; returns the count."""
+    ext, rows = file_format(path), list(rows)
+    if ext == ".csv":
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            w = csv.writer(f); w.writerow(FIELDS)
+            w.writerows([p["name"], p["category"], p["price"], p["quantity"]] for p in rows)
+        os.replace(tmp, path)
+    elif ext == ".jsonl": journal.write_lines(path, ({f: p[f] for f in FIELDS} for p in rows))
+    elif ext == ".bin": columnar.write_snapshot(path, rows)
+    else: storage.write_json(path, [{f: p[f] for f in FIELDS} for p in rows])
+    return len(rows)
+
+def export_inventory(path):
+    inventory.refresh()
+    return write_products(path, inventory.inventory)
+
+def _upsert(row, summary):
+    if not isinstance(row, dict): raise inventory.ProductError("Not a product record.")
+    name = str(row.get("name") or "").strip()
+    existing = inventory.store.get(name) if name else None
+    if existing is None:
+        inventory.put_product(inventory.validate_product(name, row.get("category"), row.get("price"), row.get("quantity")))
+        summary["added"] += 1; return
+    updated = inventory.validate_edit(existing, {f: row.get(f) for f in FIELDS if f != "name"})
+    if updated == existing: summary["unchanged"] += 1; return
+    inventory.change_product(existing, updated); summary["updated"] += 1
+
+def import_inventory(path, chunk_size=CHUNK_SIZE, on_chunk=None):
+    """Upsert every product in `path`, then save once. Rows that fail validation are
+    skipped and reported by row number. Returns a summary dict."""
+    file_format(path)
+    if not os.path.exists(path): raise FileNotFoundError(f"No such file: {path}")
+    summary = {"added": 0, "updated": 0, "unchanged": 0, "rejected": []}
+    rows, number = read_products(path), 0
+    with storage.locked():
+        inventory.refresh()
+        try:
+            with inventory.history.group(f"Import {os.path.basename(path)}"):
+                while True:
+                    chunk = list(islice(rows, chunk_size))
+                    if not chunk: break
+                    for row in chunk:
+                        number += 1
+                        try: _upsert(row, summary)
+                        except inventory.ProductError as e: summary["rejected"].append({"row": number, "error": str(e)})
+                    if on_chunk: on_chunk(number, summary)
+                if summary["added"] or summary["updated"]: inventory.save_data()
+        except BaseException:
+            # unreadable file part-way through: drop what was applied in memory
+            inventory.pending_changes.clear(); inventory.load_data(); raise
+    return summary
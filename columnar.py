@@ -0,0 +1,132 @@
+# Compact column-oriented copy of the inventory: interned categories, prices
+# (float64, exactly as stored) and quantities in typed arrays, names in one UTF-8
+# blob with an offset table. Used for vectorized aggregate queries (main.py
+# stock-summary) and for the optional binary snapshot (inventory.bin), which is
+# memory-mapped instead of parsed.
+import json, mmap, os, struct
+from array import array
+from collections import Counter
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b"HAMICOL2"   # HAMICOL1 snapshots (cent prices, uint16 categories) are rebuilt
+
+class NameTable:
+    """Names stored as one UTF-8 blob plus offsets; a name is decoded only when asked for."""
+    def __init__(self, blob, offsets):
+        self.blob, self.offsets = blob, offsets
+
+    @classmethod
+    def from_names(cls, names):
+        encoded = [n.encode("utf-8") for n in names]
+        offsets = array("q", [0])
+        for e in encoded: offsets.append(offsets[-1] + len(e))
+        return cls(b"".join(encoded), offsets)
+
+    def __len__(self): return len(self.offsets) - 1
+
+    def __getitem__(self, i): return bytes(self.blob[self.offsets[i]:self.offsets[i+1]]).decode("utf-8")
+
+    def __iter__(self): return (self[i] for i in range(len(self)))
+
+class ColumnarInventory:
+    def __init__(self, names, categories, cat_codes, prices, quantities):
+        self.names = names                # NameTable
+        self.categories = categories      # list of distinct category strings
+        self.cat_codes = cat_codes        # uint32 per product
+        self.prices = prices              # float64 per product
+        self.quantities = quantities      # int64 per product
+        self._index = None
+        self._mm = None
+
+    @classmethod
+    def from_rows(cls, rows):
+        codes, categories = {}, []
+        cat_codes, prices, quantities = array("I"), array("d"), array("q")
+        for r in rows:
+            c = r.get("category", "")
+            if c not in codes: codes[c] = len(categories); categories.append(c)
+            cat_codes.append(codes[c]); prices.append(float(r["price"])); quantities.append(int(r["quantity"]))
+        return cls(NameTable.from_names(r["name"] for r in rows), categories, cat_codes, prices, quantities)
+
+    def __len__(self): return len(self.prices)
+
+    def find(self, name):
+        """Position of a product by case-insensitive name, or None."""
+        if self._index is None: self._index = {n.strip().casefold(): i for i, n in enumerate(self.names)}
+        return self._index.get(name.strip().casefold())
+
+    def row(self, i):
+        return {"name": self.names[i], "category": self.categories[self.cat_codes[i]],
+                "price": self.prices[i], "quantity": self.quantities[i]}
+
+    def rows(self): return (self.row(i) for i in range(len(self)))
+
+    # --- aggregates ---
+    def total_value(self):
+        """Stock value (price x quantity over all products) in dollars."""
+        if np is not None:
+            return round(float(np.dot(np.asarray(self.prices, dtype=np.float64), np.asarray(self.quantities, dtype=np.float64))), 2)
+        return round(sum(map(float.__mul__, self.prices, map(float, self.quantities))), 2)
+
+    def category_counts(self):
+        if np is not None:
+            counts = np.bincount(np.asarray(self.cat_codes, dtype=np.int64), minlength=len(self.categories)).tolist()
+        else:
+            c = Counter(self.cat_codes); counts = [c[i] for i in range(len(self.categories))]
+        return dict(zip(self.categories, counts))
+
+    def category_quantities(self):
+        if np is not None:
+            q = np.bincount(np.asarray(self.cat_codes, dtype=np.int64), weights=np.asarray(self.quantities, dtype=np.float64),
+                            minlength=len(self.categories))
+            return dict(zip(self.categories, (int(x) for x in q)))
+        totals = [0] * len(self.categories)
+        for code, qty in zip(self.cat_codes, self.quantities): totals[code] += qty
+        return dict(zip(self.categories, totals))
+
+    def close(self):
+        if self._mm is not None:
+            self.names = self.cat_codes = self.prices = self.quantities = None
+            self._mm.close(); self._mm = None
+
+# ------------------ Binary snapshot ------------------
+# MAGIC | header length (int64) | JSON header | columns, each 8-byte aligned:
+# prices float64[n], quantities int64[n], cat_codes uint32[n], name offsets int64[n+1], name blob
+def _pad(n): return (8 - n % 8) % 8
+
+def write_snapshot(path, rows, source_version=None):
+    col = rows if isinstance(rows, ColumnarInventory) else ColumnarInventory.from_rows(rows)
+    names = col.names if isinstance(col.names, NameTable) else NameTable.from_names(col.names)
+    header = json.dumps({"count": len(col), "categories": col.categories, "source": source_version}).encode("utf-8")
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<q", len(header)) + header + b"\0" * _pad(len(header)))
+        for arr in (array("d", col.prices), array("q", col.quantities), array("I", col.cat_codes), array("q", names.offsets)):
+            data = arr.tobytes(); f.write(data + b"\0" * _pad(len(data)))
+        f.write(bytes(names.blob))
+        f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def load_snapshot(path):
+    """Map a snapshot into memory; numeric columns are zero-copy views of the file.
+    Returns (ColumnarInventory, source_version) or (None, None) if there is no valid snapshot."""
+    if not os.path.exists(path) or os.path.getsize(path) < 16: return None, None
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:8] != MAGIC: mm.close(); return None, None
+    (hlen,) = struct.unpack_from("<q", mm, 8)
+    header = json.loads(mm[16:16 + hlen].decode("utf-8"))
+    n, view, pos = header["count"], memoryview(mm), 16 + hlen + _pad(hlen)
+    def take(fmt, count, size):
+        nonlocal pos
+        col = view[pos:pos + count * size].cast(fmt)
+        pos += count * size + _pad(count * size)
+        return col
+    prices, quantities, cat_codes = take("d", n, 8), take("q", n, 8), take("I", n, 4)
+    offsets = take("q", n + 1, 8)
+    col = ColumnarInventory(NameTable(view[pos:pos + offsets[n]], offsets), header["categories"], cat_codes, prices, quantities)
+    col._mm = mm
+    return col, header.get("source")
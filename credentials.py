@@ -0,0 +1,63 @@
+# Password hashing and the in-memory user index used by main.py's login flows.
+# Passwords are stored as salted PBKDF2-SHA256 hashes
+#   "password_hash": "pbkdf2_sha256$<iterations>$<salt>$<hash>"   (base64 salt/hash)
+# with the cost set by HAMI_HASH_ITERATIONS. Accounts still holding a plaintext
+# "password" (older users.json files) are upgraded on their next successful
+# login, as are hashes made with a different cost.
+import base64, hashlib, hmac, os
+import storage
+
+ITERATIONS = int(os.environ.get("HAMI_HASH_ITERATIONS", "200000"))
+ALGORITHM = "pbkdf2_sha256"
+
+def _b64(data): return base64.b64encode(data).decode("ascii")
+
+def hash_password(password, iterations=None, salt=None):
+    iterations = iterations or ITERATIONS
+    salt = salt or os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{ALGORITHM}${iterations}${_b64(salt)}${_b64(digest)}"
+
+def _check(encoded, password):
+    try:
+        algorithm, iterations, salt, _ = encoded.split("$")
+        expected = hash_password(password, int(iterations), base64.b64decode(salt))
+    except ValueError:
+        return False
+    return algorithm == ALGORITHM and hmac.compare_digest(expected, encoded)
+
+_DUMMY = hash_password("", salt=b"\0" * 16)
+
+def verify(user, password):
+    """True if `password` is the user's password. Unknown users (None) cost the same
+    as known ones, so timing does not reveal which usernames exist."""
+    if user is None: _check(_DUMMY, password); return False
+    if "password_hash" in user: return _check(user["password_hash"], password)
+    return hmac.compare_digest(str(user.get("password", "")).encode("utf-8"), password.encode("utf-8"))
+
+def set_password(user, password):
+    """Store a hash of `password`; returns True if a plaintext password was dropped."""
+    user["password_hash"] = hash_password(password)
+    return user.pop("password", None) is not None
+
+def needs_upgrade(user):
+    """Plaintext password, or a hash made with a different cost than configured."""
+    encoded = user.get("password_hash")
+    return encoded is None or encoded.split("$")[1:2] != [str(ITERATIONS)]
+
+class UserStore:
+    """User records plus a case-folded username -> user index."""
+    def __init__(self, users=()):
+        self.items = []
+        self.by_name = {}
+        for u in users: self.add(u)
+
+    def get(self, username): return self.by_name.get(storage.name_key(username))
+
+    def add(self, user):
+        self.items.append(user); self.by_name[storage.name_key(user["username"])] = user
+        return user
+
+    def __iter__(self): return iter(self.items)
+
+    def __len__(self): return len(self.items)
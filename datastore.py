@@ -0,0 +1,32 @@
+# Cached copies of the data files. Each file has one loader; its parsed result is
+# kept and handed out again while the backend's version stamp of the file (size
+# and mtime of the JSON file and its journal, or the version row in SQLite) is
+# unchanged, so the file is re-read only after another process has written it.
+import storage
+
+UNLOADED = object()   # version of a cache that has not been filled yet
+
+class CachedFile:
+    def __init__(self, path, loader):
+        self.path, self.loader = path, loader
+        self.data, self.version = None, UNLOADED
+
+    def fresh(self):
+        """True if the cached data matches what is on disk."""
+        return self.version is not UNLOADED and storage.backend.version(self.path) == self.version
+
+    def get(self):
+        """The parsed data, (re)loaded first if the file changed since it was read."""
+        with storage.locked():
+            version = storage.backend.version(self.path)
+            if version != self.version or self.version is UNLOADED:
+                self.data, self.version = self.loader(self.path), version
+            return self.data
+
+    def saved(self, data):
+        """Record that `data` is what this process has just written to the file."""
+        with storage.locked():
+            self.data, self.version = data, storage.backend.version(self.path)
+
+    def invalidate(self):
+        self.data, self.version = None, UNLOADED
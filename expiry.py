@@ -0,0 +1,53 @@
+# Order expiry bookkeeping: cached timestamp parsing, a min-heap of order
+# creation times so a sweep only touches orders that have actually expired,
+# and an optional background sweeper thread.
+import heapq, threading
+from datetime import datetime
+from functools import lru_cache
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+@lru_cache(maxsize=65536)
+def parse_ts(ts): return datetime.strptime(ts, TS_FORMAT).timestamp()
+
+class ExpiryIndex:
+    """Min-heap of (created_at, order_id). Entries for orders that were edited (new
+    timestamp) or deleted are left in the heap and skipped when they surface."""
+    def __init__(self):
+        self.heap = []
+        self.live = {}
+
+    def rebuild(self, orders):
+        self.live = {o['order_id']: parse_ts(o['timestamp']) for o in orders}
+        self.rebuild_heap()
+
+    def add(self, order):
+        t = parse_ts(order['timestamp'])
+        self.live[order['order_id']] = t
+        heapq.heappush(self.heap, (t, order['order_id']))
+
+    def discard(self, order_id): self.live.pop(order_id, None)
+
+    def pop_expired(self, cutoff):
+        """Remove and return the ids of live orders created at or before `cutoff` (epoch)."""
+        out = []
+        while self.heap and self.heap[0][0] <= cutoff:
+            t, oid = heapq.heappop(self.heap)
+            if self.live.get(oid) == t:
+                del self.live[oid]; out.append(oid)
+        if len(self.heap) > 2 * len(self.live) + 64: self.rebuild_heap()
+        return out
+
+    def rebuild_heap(self):
+        self.heap = [(t, oid) for oid, t in self.live.items()]
+        heapq.heapify(self.heap)
+
+def start_sweeper(sweep, interval):
+    """Call sweep() every `interval` seconds on a daemon thread; returns a stop Event."""
+    stop = threading.Event()
+    def run():
+        while not stop.wait(interval):
+            try: sweep()
+            except Exception as e: print(f"⚠️ Expiry sweep failed: {e}")
+    threading.Thread(target=run, daemon=True).start()
+    return stop
@@ -0,0 +1,164 @@
+# Opt-in instrumentation. With HAMI_PROFILE=stats.json (or `--profile stats.json`)
+# every function of the inventory, order, main and storage modules, the store and
+# backend methods, journal and receipt writes are wrapped at startup to record
+# call counts and timings, bytes read/written by the file layer, and a latency
+# histogram per checkout; the numbers are written as JSON at exit.
+# HAMI_CPROFILE=run.prof (or `--cprofile run.prof`) also runs cProfile and dumps
+# pstats data. When neither is set nothing is wrapped, so there is no overhead.
+import atexit, functools, inspect, json, os, sys, threading, time
+
+PROFILE = os.environ.get("HAMI_PROFILE")
+CPROFILE = os.environ.get("HAMI_CPROFILE")
+MODULES = ("inventory", "order", "main", "storage", "journal", "receipts", "reservations", "batch_orders", "bulk_inventory", "order_archive", "branch_sync")
+CLASSES = (("inventory", "InventoryStore"), ("storage", "JsonBackend"), ("storage", "SqliteBackend"),
+           ("order", "CheckoutTransaction"), ("datastore", "CachedFile"))
+SKIP = {"pause", "clear_screen", "get_valid_number", "main_menu", "login_flow", "manage_account", "run_cli",
+        "locked", "_work"}  # interactive loops (user think time) and long-lived helpers
+HISTOGRAMS = {"CheckoutTransaction.commit"}
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+_lock = threading.Lock()
+_started = time.time()
+stats = {}          # name -> [calls, total seconds, max seconds]
+histograms = {}     # name -> counts per bucket (last bucket = slower than BUCKETS_MS[-1])
+io = {"reads": 0, "read_bytes": 0, "writes": 0, "written_bytes": 0}
+enabled = False
+
+def record(name, seconds):
+    with _lock:
+        s = stats.setdefault(name, [0, 0.0, 0.0])
+        s[0] += 1; s[1] += seconds; s[2] = max(s[2], seconds)
+        if name in HISTOGRAMS:
+            h = histograms.setdefault(name, [0] * (len(BUCKETS_MS) + 1))
+            ms = seconds * 1000
+            h[next((i for i, b in enumerate(BUCKETS_MS) if ms <= b), len(BUCKETS_MS))] += 1
+
+def count_io(kind, nbytes):
+    """kind is "read" or "write"."""
+    with _lock:
+        io[kind + "s"] += 1; io[("read" if kind == "read" else "written") + "_bytes"] += nbytes
+
+def _size(path):
+    try: return os.path.getsize(path)
+    except (OSError, TypeError): return 0
+
+# ------------------ Wrapping ------------------
+def timed(fn, name):
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def gen(*args, **kwargs):
+            it, spent = fn(*args, **kwargs), 0.0
+            try:
+                while True:
+                    t = time.perf_counter()
+                    try: value = next(it)
+                    except StopIteration: return
+                    finally: spent += time.perf_counter() - t
+                    yield value
+            finally: record(name, spent)
+        return gen
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        t = time.perf_counter()
+        try: return fn(*args, **kwargs)
+        finally: record(name, time.perf_counter() - t)
+    return wrapper
+
+def _project_modules():
+    here = os.path.dirname(os.path.abspath(__file__))
+    return [m for m in list(sys.modules.values())
+            if os.path.dirname(os.path.abspath(getattr(m, "__file__", None) or os.sep)) == here]
+
+def _replace(old, new, modules):
+    """Point every module-level reference to `old` (including `from x import old`) at `new`."""
+    for m in modules:
+        for attr, value in list(vars(m).items()):
+            if value is old: setattr(m, attr, new)
+
+def _io_wrappers():
+    import journal, storage, receipts, columnar
+    def after_write(path_of):
+        def wrap(fn):
+            @functools.wraps(fn)
+            def w(*args, **kwargs):
+                out = fn(*args, **kwargs); count_io("write", _size(path_of(args))); return out
+            return w
+        return wrap
+    def before_read(fn):
+        @functools.wraps(fn)
+        def w(path, *args, **kwargs):
+            count_io("read", _size(path)); return fn(path, *args, **kwargs)
+        return w
+    def append(fn):
+        @functools.wraps(fn)
+        def w(snapshot, records):
+            before = _size(journal.journal_path(snapshot)); out = fn(snapshot, records)
+            count_io("write", _size(journal.journal_path(snapshot)) - before); return out
+        return w
+    def store(fn):
+        @functools.wraps(fn)
+        def w(name, text):
+            out = fn(name, text); count_io("write", len(text.encode("utf-8"))); return out
+        return w
+    first = lambda args: args[0]
+    return [(journal, "write_snapshot", after_write(first)), (journal, "write_lines", after_write(first)),
+            (columnar, "write_snapshot", after_write(first)), (journal, "append", append),
+            (receipts, "_store", store), (storage, "read_json", before_read), (storage, "iter_records", before_read),
+            (columnar, "load_snapshot", before_read)]
+
+def install():
+    """Wrap the instrumented functions. Call once, after the project modules are imported."""
+    global enabled
+    if enabled: return
+    enabled = True
+    main = sys.modules.get("__main__")
+    if os.path.basename(getattr(main, "__file__", "") or "") == "main.py": sys.modules.setdefault("main", main)
+    for name in MODULES: __import__(name)
+    modules = _project_modules()
+    for name in MODULES:
+        mod = sys.modules[name]
+        for attr, fn in list(vars(mod).items()):
+            if inspect.isfunction(fn) and fn.__module__ == mod.__name__ and attr not in SKIP:
+                _replace(fn, timed(fn, f"{name}.{attr}"), modules)
+    for mod_name, cls_name in CLASSES:
+        cls = getattr(sys.modules[mod_name], cls_name)
+        for attr, fn in list(vars(cls).items()):
+            if inspect.isfunction(fn) and (attr == "__init__" or not attr.startswith("__")):
+                setattr(cls, attr, timed(fn, f"{cls_name}.{attr}"))
+    for mod, attr, wrap in _io_wrappers():
+        old = getattr(mod, attr)
+        _replace(old, wrap(old), modules)
+    # functions stored as default arguments (journal.commit/compact) keep the original
+    # writer; storage always passes write_records explicitly, which is wrapped.
+
+def snapshot():
+    with _lock:
+        ops = {name: {"calls": c, "total_ms": round(t * 1000, 3), "mean_ms": round(t * 1000 / c, 3), "max_ms": round(m * 1000, 3)}
+               for name, (c, t, m) in sorted(stats.items(), key=lambda kv: -kv[1][1])}
+        hist = {name: {**{f"<={b}ms": n for b, n in zip(BUCKETS_MS, counts)}, f">{BUCKETS_MS[-1]}ms": counts[-1]}
+                for name, counts in histograms.items()}
+        saves = {name: ops[name]["calls"] for name in ("inventory.save_data", "order.save_orders", "main.save_users", "main.save_user")
+                 if name in ops}
+        return {"started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(_started)),
+                "elapsed_s": round(time.time() - _started, 3), "operations": ops, "saves": saves,
+                "io": dict(io), "latency_histograms": hist}
+
+def dump(path):
+    if "receipts" in sys.modules: sys.modules["receipts"].flush()  # count receipts still queued
+    with open(path, "w", encoding="utf-8") as f: json.dump(snapshot(), f, indent=2)
+
+def setup(argv):
+    """Enable instrumentation from HAMI_PROFILE / HAMI_CPROFILE or the --profile FILE /
+    --cprofile FILE options (removed from argv). Returns the remaining arguments."""
+    profile, cprofile, rest, args = PROFILE, CPROFILE, [], iter(argv)
+    for a in args:
+        if a == "--profile": profile = next(args, None)
+        elif a == "--cprofile": cprofile = next(args, None)
+        else: rest.append(a)
+    if profile:
+        install(); atexit.register(dump, profile)
+    if cprofile:
+        import cProfile
+        prof = cProfile.Profile(); prof.enable()
+        atexit.register(lambda: (prof.disable(), prof.dump_stats(cprofile)))
+    return rest
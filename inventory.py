@@ -1,8 +1,92 @@
 # Importing modules for file handling and JSON data operations
-import json, os 
+import atexit, json, os 
+import storage, columnar, stock_alerts, paging, undo_log, datastore, branch_sync
+from search_index import SearchIndex
 INVENTORY_FILE = "inventory.json"
-inventory = []
-last_change = None
+SNAPSHOT_FILE = "inventory.bin"
+SNAPSHOT_MODE = os.environ.get("HAMI_SNAPSHOT", "0") == "1"
+
+class InventoryStore:
+    """Product list plus a case-folded name -> product index kept in step with it.
+    The search index is built on first search and then maintained incrementally
+    (a reload only re-indexes the products that changed); the low-stock set is
+    updated on every change."""
+    def __init__(self):
+        self.items = []
+        self.by_name = {}
+        self.index = None
+        self.low_stock = stock_alerts.LowStockTracker()
+
+    @staticmethod
+    def key(name): return name.strip().casefold()
+
+    def get(self, name): return self.by_name.get(self.key(name))
+
+    def __contains__(self, name): return self.key(name) in self.by_name
+
+    def __len__(self): return len(self.items)
+
+    def clear(self):
+        self.items.clear(); self.by_name.clear(); self.index = None; self.low_stock.clear()
+
+    def load(self, rows):
+        """Replace the contents with `rows`, keeping the search index if there is one."""
+        index = self.index
+        self.clear()
+        for row in rows: self.add(row)
+        if index is not None: index.sync(self.items); self.index = index
+
+    def add(self, product):
+        self.items.append(product); self.by_name[self.key(product["name"])] = product
+        if self.index: self.index.add(product)
+        self.low_stock.update(product)
+        return product
+
+    def remove(self, name):
+        product = self.by_name.pop(self.key(name), None)
+        if product is not None:
+            self.items.remove(product)
+            if self.index: self.index.remove(product)
+            self.low_stock.discard(product)
+        return product
+
+    def update(self, product, changes):
+        old_key = self.key(product["name"])
+        reindex = self.index and (changes.get("name", product["name"]) != product["name"]
+                                  or changes.get("category", product["category"]) != product["category"])
+        if reindex: self.index.remove(product)
+        self.low_stock.discard(product)
+        product.update(changes)
+        if reindex: self.index.add(product)
+        new_key = self.key(product["name"])
+        if new_key != old_key:
+            del self.by_name[old_key]; self.by_name[new_key] = product
+        self.low_stock.update(product)
+        return product
+
+    def search(self, term, page=1, page_size=20):
+        """Ranked (products, total) for a name/category query, see search_index.SearchIndex."""
+        if self.index is None:
+            self.index = SearchIndex()
+            for p in self.items: self.index.add(p)
+        keys, total = self.index.search(term, page, page_size)
+        return [self.by_name[k] for k in keys], total
+
+store = InventoryStore()
+inventory = store.items
+history = undo_log.History()
+pending_changes = []
+loaded_version = datastore.UNLOADED
+snapshot_version = None   # data version inventory.bin was last read or written at by this process
+before_save = []   # called under the lock before every save (order.py: roll back a checkout that died mid-commit)
+
+def log_change(op, **fields): pending_changes.append(dict(op=op, **fields))
+
+def adjust_stock(product, delta):
+    product["quantity"] += delta
+    store.low_stock.update(product)
+    log_change("stock", name=product["name"], quantity=product["quantity"], delta=delta)
+    history.record({"op": "stock", "name": product["name"], "delta": delta}, f"Stock {product['name']} {delta:+d}")
 
 def pause(): input("\nPress Enter to continue...")
 
@@ -16,37 +100,224 @@ def get_valid_number(prompt, allow_blank=False, is_int=False):
         except:
             print("Please enter a valid number or 'cancel'.")
 
-def stock_status(qty):
-    if qty < 20: return "🔴 LOW STOCK"
-    if qty < 100: return "🟡 MODERATE STOCK"
+def stock_status(qty, product=None):
+    low, good = stock_alerts.thresholds.for_product(product) if product else (stock_alerts.DEFAULT_LOW, stock_alerts.DEFAULT_GOOD)
+    if qty < low: return "🔴 LOW STOCK"
+    if qty < good: return "🟡 MODERATE STOCK"
     return "🟢 GOOD STOCK"
 
 def save_data(filename=INVENTORY_FILE):
-    with open(filename,"w",encoding="utf-8") as f:
-        json.dump(inventory,f,indent=2,ensure_ascii=False)
+    global loaded_version
+    changes = pending_changes[:]; pending_changes.clear()
+    with storage.locked():
+        for hook in before_save: hook()
+        if storage.backend.version(filename) != loaded_version:
+            # another process wrote since we loaded: rebase our changes onto its data
+            rows = storage.backend.load_inventory(filename)
+            changes = storage.rebase_inventory(rows, changes)
+            fill_store(storage.replay_inventory(rows, changes))
+        storage.backend.save_inventory(filename, inventory, changes)
+        branch_sync.publish(changes)
+        loaded_version = storage.backend.version(filename)
+
+def fill_store(rows):
+    for row in rows:
+        row["price"] = float(row.get("price",0))
+        row["quantity"] = int(row.get("quantity",0))
+    store.load(rows)
 
 def load_data(filename=INVENTORY_FILE):
-    global inventory
-    inventory.clear()
-    if not os.path.exists(filename): return
-    with open(filename,"r",encoding="utf-8") as f:
-        data = json.load(f)
-        for row in data:
-            row["price"] = float(row.get("price",0))
-            row["quantity"] = int(row.get("quantity",0))
-            inventory.append(row)
+    global loaded_version, snapshot_version
+    with storage.locked():
+        loaded_version = storage.backend.version(filename)
+        stamp = json.loads(json.dumps(loaded_version))
+        if SNAPSHOT_MODE:
+            # the binary snapshot is used only if it was written from the current data
+            col, source = columnar.load_snapshot(SNAPSHOT_FILE)
+            if col is not None:
+                fresh = source == stamp
+                if fresh: fill_store(list(col.rows())); snapshot_version = stamp
+                col.close()
+                if fresh: return
+        fill_store(storage.backend.load_inventory(filename))
+
+def write_snapshot():
+    """Rewrite the binary snapshot from the loaded store if it is current and the snapshot
+    is not (run at exit with HAMI_SNAPSHOT=1, so saves never pay for it)."""
+    global snapshot_version
+    with storage.locked():
+        if pending_changes or loaded_version is datastore.UNLOADED or storage.backend.version(INVENTORY_FILE) != loaded_version: return
+        stamp = json.loads(json.dumps(loaded_version))
+        if stamp != snapshot_version: columnar.write_snapshot(SNAPSHOT_FILE, inventory, stamp); snapshot_version = stamp
+
+if SNAPSHOT_MODE: atexit.register(write_snapshot)
+
+def columns():
+    """Columnar copy of the inventory for aggregate queries: the memory-mapped snapshot
+    if it matches the current data (no product dicts are built), else one built from
+    the store. Close it when done."""
+    with storage.locked():
+        if SNAPSHOT_MODE:
+            col, source = columnar.load_snapshot(SNAPSHOT_FILE)
+            if col is not None and source == json.loads(json.dumps(storage.backend.version(INVENTORY_FILE))): return col
+            if col is not None: col.close()
+        refresh()
+        return columnar.ColumnarInventory.from_rows(inventory)
+
+def stock_summary():
+    """Product count, total stock value and per-category product counts and quantities."""
+    col = columns()
+    try:
+        counts, quantities = col.category_counts(), col.category_quantities()
+        return {"products": len(col), "value": col.total_value(),
+                "categories": [{"category": c, "products": counts[c], "quantity": quantities[c]}
+                               for c in sorted(counts, key=str.casefold)]}
+    finally: col.close()
+
+def refresh(filename=INVENTORY_FILE):
+    """Load on first use; afterwards reload only if another process has written since our last load/save."""
+    with storage.locked():
+        if loaded_version is datastore.UNLOADED or storage.backend.version(filename) != loaded_version: load_data(filename)
+
+def product_names():
+    """Names of all products, from the loaded store (read from disk only if it changed)."""
+    refresh()
+    return [p["name"] for p in inventory]
+
+# ------------------ Headless operations (service API) ------------------
+class ProductError(ValueError): pass
+class ProductInputError(ProductError): pass   # bad or missing values, as opposed to a conflict
+
+def whole_number(value):
+    """int(value), refusing fractions (a JSON 2.7) instead of truncating them."""
+    if isinstance(value, float) and not value.is_integer(): raise ValueError(f"{value} is not a whole number")
+    return int(value)
+
+def validate_product(name, category, price, quantity):
+    """A new product record from raw values; raises ProductError if one is missing or not a number."""
+    name, category = str(name or "").strip(), str(category or "").strip()
+    if not name or not category: raise ProductInputError("Name and category are required.")
+    try: return {"name": name, "category": category, "price": float(price), "quantity": whole_number(quantity)}
+    except (TypeError, ValueError): raise ProductInputError("Price must be a number and quantity a whole number.")
+
+def validate_edit(product, changes):
+    """A copy of `product` with the non-blank fields of `changes` applied; a name or
+    category of only spaces is refused, not applied."""
+    for field in ("name", "category"):
+        if changes.get(field) not in (None, "") and not str(changes[field]).strip():
+            raise ProductInputError("Name and category must not be blank.")
+    updated = product.copy()
+    try:
+        for field, cast in (("name", str), ("category", str), ("price", float), ("quantity", whole_number)):
+            if changes.get(field) not in (None, ""): updated[field] = cast(changes[field]).strip() if cast is str else cast(changes[field])
+    except (TypeError, ValueError): raise ProductInputError("Price must be a number and quantity a whole number.")
+    return updated
+
+def put_product(product):
+    """Add a validated product (not saved)."""
+    store.add(product); log_change("add", product=product.copy())
+    history.record({"op": "add", "product": product.copy()}, f"Add {product['name']}")
+    return product
 
+def _log_update(old_name, product, fields):
+    # a rename also carries category and price: a branch view (branch_sync) knows the
+    # product only by name, and must not fill them in from whatever it holds under the new one
+    if "name" in fields: fields = dict({f: product[f] for f in ("category", "price")}, **fields)
+    log_change("update", name=old_name, product=fields)
+
+def change_product(product, updated):
+    """Apply a validated edit (not saved); raises ProductError if the new name is taken."""
+    if store.get(updated["name"]) not in (None, product): raise ProductError("Another product already has that name.")
+    old = product.copy()
+    diff = {f: [old.get(f), updated[f]] for f in updated if updated[f] != old.get(f)}
+    store.update(product, updated); _log_update(old["name"], product, {f: v[1] for f, v in diff.items()})
+    history.record({"op": "update", "name": updated["name"], "diff": diff}, f"Update {old['name']} ({', '.join(diff)})")
+    return product
+
+def create_product(name, category, price, quantity):
+    """Add a product and save; raises ProductError if it is invalid or exists."""
+    product = validate_product(name, category, price, quantity)
+    with storage.locked():
+        refresh()
+        if product["name"] in store: raise ProductError("Exists. Use update instead.")
+        put_product(product); save_data()
+    return product
+
+def edit_product(name, changes):
+    """Change name/category/price/quantity of a product and save; returns the product."""
+    with storage.locked():
+        refresh()
+        product = store.get(name)
+        if not product: raise ProductError("Not found.")
+        updated = validate_edit(product, changes)
+        if updated == product: return product
+        change_product(product, updated); save_data()
+    return product
+
+def remove_product(name):
+    with storage.locked():
+        refresh()
+        product = store.remove(name)
+        if not product: raise ProductError("Not found.")
+        log_change("delete", name=product["name"])
+        history.record({"op": "delete", "product": product.copy()}, f"Delete {product['name']}"); save_data()
+    return product
+
+def _apply(change, forward):
+    """Redo (forward) or undo one history change, finding products through the name
+    index; a change whose product has since gone (or whose name is taken) is skipped."""
+    op, side = change["op"], 1 if forward else 0
+    if op == "stock":
+        p = store.get(change["name"])
+        if p: adjust_stock(p, change["delta"] if forward else -change["delta"])
+    elif op == "update":
+        names = change["diff"].get("name", [change["name"], change["name"]])
+        p = store.get(names[1 - side])
+        if p and store.get(names[side]) in (None, p):
+            before, fields = p["name"], {f: v[side] for f, v in change["diff"].items()}
+            store.update(p, fields); _log_update(before, p, fields)
+    elif (op == "add") == forward:
+        if change["product"]["name"] not in store:
+            p = store.add(dict(change["product"])); log_change("add", product=p.copy())
+    else:
+        p = store.remove(change["product"]["name"])
+        if p: log_change("delete", name=p["name"])
+
+def _replay(redo):
+    with storage.locked():
+        refresh()
+        top = history.peek_redo() if redo else history.peek_undo()
+        if not top: return None
+        orders = [c for c in top[0]["changes"] if c["op"] == "order"]
+        if orders:
+            import order  # checkouts and order edits: order.py (which imports this module) handles the orders
+            skip = order.undo_conflict(orders, redo)
+        entry = history.redo() if redo else history.undo()
+        if orders and skip: return f"{entry['label']} (skipped: {skip})"
+        with history.paused():
+            for change in (entry["changes"] if redo else reversed(entry["changes"])):
+                if change["op"] != "order": _apply(change, redo)
+        save_data()
+        if orders: order.undo_apply(orders, redo)
+        return entry["label"]
+
+def undo_change():
+    """Undo the newest history entry and save; returns its label (None if nothing to undo)."""
+    return _replay(False)
+
+def redo_change(): return _replay(True)
+
+# ------------------ Menu flows ------------------
 def add_product():
-    global last_change
+    refresh()
     print("Add product (type 'cancel' to abort)")
     while True:
         name = input("Name: ").strip()
         if name.lower()=="cancel": print("Cancelled."); return
         if not name: print("Name required."); continue
         break
-    for p in inventory:
-        if p["name"].lower()==name.lower():
-            print("Exists. Use update instead."); return
+    if name in store:
+        print("Exists. Use update instead."); return
     while True:
         cat = input("Category: ").strip()
         if cat.lower()=="cancel": print("Cancelled."); return
@@ -56,12 +327,10 @@ def add_product():
     if price=="cancel": return
     qty = get_valid_number("Quantity: ", is_int=True)
     if qty=="cancel": return
-    product={"name":name,"category":cat,"price":price,"quantity":qty}
-    inventory.append(product); save_data(); last_change={"action":"add","product":product.copy()}
+    create_product(name, cat, price, qty)
     print("✅ Added."); pause()
 
 def update_existing_product(product):
-    global last_change
     print(f"Updating product: {product['name']}")
     print(f"Category: {product['category']}\nPrice: {product['price']}\nQuantity: {product['quantity']}")
     print("Leave blank to keep current. Type 'cancel' to abort.")
@@ -80,63 +349,95 @@ def update_existing_product(product):
     if new_qty is not None: updated["quantity"]=new_qty
     if updated==old:
         print("No changes."); pause(); return
+    if store.get(updated["name"]) not in (None, product):
+        print("Another product already has that name."); pause(); return
     if input("Save changes? (y/n): ").strip().lower()!="y":
         print("Cancelled."); pause(); return
-    product.update(updated); save_data(); last_change={"action":"update","old":old,"new":updated}
+    edit_product(old["name"], updated)
     print("✅ Updated."); pause()
 
 def update_product():
+    refresh()
     name = input("Enter product name to update (or 'cancel'): ").strip()
     if name.lower()=="cancel" or not name: print("Cancelled."); return
-    for p in inventory:
-        if p["name"].lower()==name.lower(): update_existing_product(p); return
+    p = store.get(name)
+    if p: update_existing_product(p); return
     print("Not found."); pause()
 
-def view_products():
-    if not inventory: print("No products."); pause(); return
+PRODUCT_SORTS = {"name": lambda p: store.key(p["name"]), "category": lambda p: (store.key(p["category"]), store.key(p["name"])),
+                 "quantity": lambda p: p["quantity"], "price": lambda p: p["price"]}
+
+def product_pager(sort=None, reverse=False, category=None, size=paging.PAGE_SIZE):
+    def rows():
+        if not category: return iter(inventory)
+        c = store.key(category)
+        return (p for p in inventory if store.key(p["category"]) == c)
+    return paging.Pager(rows, size, PRODUCT_SORTS.get(sort), reverse)
+
+def show_products(rows, first=1):
     print(f"{'Name':<20}{'Category':<15}{'Price':<10}{'Qty':<8}Status")
     print("-"*70)
-    for p in inventory:
-        print(f"{p['name']:<20}{p['category']:<15}{p['price']:<10}{p['quantity']:<8}{stock_status(p['quantity'])}")
+    for p in rows:
+        print(f"{p['name']:<20}{p['category']:<15}{p['price']:<10}{p['quantity']:<8}{stock_status(p['quantity'], p)}")
+
+def view_products():
+    if not inventory: print("No products."); pause(); return
+    opts = input("Sort by name/category/quantity/price ('-' for descending), filter with category=NAME (blank = as stored): ").strip()
+    try: sort, reverse, filters = paging.parse_options(opts, PRODUCT_SORTS, ("category",))
+    except ValueError as e: print(f"Unknown option: {e}"); pause(); return
+    if not paging.browse(product_pager(sort, reverse, filters.get("category")), show_products): print("No products.")
+    pause()
+
+def low_stock_report():
+    low = sorted(store.low_stock.products(), key=lambda p: p["quantity"])
+    if not low: print("✅ No products are low on stock."); pause(); return
+    print(f"{'Name':<20}{'Category':<15}{'Qty':<8}Low below")
+    print("-"*55)
+    for p in low:
+        print(f"{p['name']:<20}{p['category']:<15}{p['quantity']:<8}{stock_alerts.thresholds.for_product(p)[0]}")
     pause()
 
 def delete_product():
-    global last_change
+    refresh()
     name = input("Enter product name to delete (or 'cancel'): ").strip()
     if name.lower()=="cancel" or not name: print("Cancelled."); return
-    for p in inventory:
-        if p["name"].lower()==name.lower():
-            if input(f"Confirm delete {name}? (y/n): ").strip().lower()=="y":
-                inventory.remove(p); save_data(); last_change={"action":"delete","product":p.copy()}; print("Deleted.")
-            else:
-                print("Cancelled.")
-            pause(); return
+    p = store.get(name)
+    if p:
+        if input(f"Confirm delete {name}? (y/n): ").strip().lower()=="y":
+            remove_product(p["name"]); print("Deleted.")
+        else:
+            print("Cancelled.")
+        pause(); return
     print("Not found."); pause()
 
-def undo_last_change():
-    global last_change
-    if not last_change: print("No recent changes."); pause(); return
-    a=last_change["action"]
-    if a=="add":
-        prod=last_change["product"]
-        inventory[:] = [p for p in inventory if p['name'].lower()!=prod['name'].lower()]
-        print("Undo add.")
-    elif a=="delete":
-        inventory.append(last_change["product"]); print("Undo delete.")
-    elif a=="update":
-        old=last_change["old"]
-        for i,p in enumerate(inventory):
-            if p["name"].lower()==old["name"].lower():
-                inventory[i]=old; print("Undo update."); break
-    save_data(); last_change=None; pause()
+def undo_redo():
+    while True:
+        undo, redo = history.peek_undo(5), history.peek_redo()
+        if not undo and not redo: print("No recent changes."); pause(); return
+        print("Recent changes (newest first):")
+        for i, e in enumerate(undo, 1): print(f"{i}. {e['label']}")
+        if redo: print(f"Next redo: {redo[0]['label']}")
+        ch = input("'u' = undo, 'r' = redo, Enter = done: ").strip().lower()
+        try:
+            if ch == "u" and undo: print(f"Undone: {undo_change()}")
+            elif ch == "r" and redo: print(f"Redone: {redo_change()}")
+            else: return
+        except ProductError as e: print(e)
+
+def find_products(term, page=1, page_size=20):
+    return store.search(term, page, page_size)[0]
 
 def search_product():
     term = input("Enter search keyword (or 'cancel'): ").strip()
     if term.lower()=="cancel" or not term: print("Cancelled."); return
-    found = [p for p in inventory if term.lower() in p["name"].lower()]
-    if not found: print("No matches."); pause(); return
-    print(f"{'Name':<20}{'Category':<15}{'Price':<10}{'Qty':<8}Status")
-    print("-"*70)
-    for p in found:
-        print(f"{p['name']:<20}{p['category']:<15}{p['price']:<10}{p['quantity']:<8}{stock_status(p['quantity'])}")
-    pause()
+    page, size = 1, 20
+    while True:
+        found, total = store.search(term, page, size)
+        if not found: print("No matches."); pause(); return
+        print(f"{'Name':<20}{'Category':<15}{'Price':<10}{'Qty':<8}Status")
+        print("-"*70)
+        for p in found:
+            print(f"{p['name']:<20}{p['category']:<15}{p['price']:<10}{p['quantity']:<8}{stock_status(p['quantity'], p)}")
+        if page*size >= total: pause(); return
+        if input(f"Showing {(page-1)*size+1}-{(page-1)*size+len(found)} of {total}. Enter for more, 'q' to stop: ").strip().lower()=="q": return
+        page += 1
@@ -0,0 +1,63 @@
+# Append-only write-ahead journal: each mutation is one JSON line, fsynced,
+# and the journal is periodically compacted into the regular JSON snapshot.
+import json, os
+
+JOURNAL_MODE = os.environ.get("HAMI_JOURNAL", "0") == "1"
+COMPACT_EVERY = int(os.environ.get("HAMI_JOURNAL_COMPACT", "500"))
+
+_line_counts = {}
+
+def journal_path(snapshot): return snapshot + ".journal"
+
+def write_snapshot(path, data):
+    """Write the full document to a temp file and swap it in atomically."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def write_lines(path, records):
+    """Write records as JSON Lines (one compact object per line), streamed from any
+    iterable, to a temp file swapped in atomically."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for rec in records: f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def replay(snapshot):
+    """Yield journal records in order. A torn last line (crash mid-append) is ignored."""
+    path = journal_path(snapshot)
+    count = 0
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try: rec = json.loads(line)
+                except json.JSONDecodeError: break
+                count += 1
+                yield rec
+    _line_counts[path] = count
+
+def append(snapshot, records):
+    path = journal_path(snapshot)
+    if path not in _line_counts:
+        for _ in replay(snapshot): pass
+    with open(path, "a", encoding="utf-8") as f:
+        for rec in records: f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        f.flush(); os.fsync(f.fileno())
+    _line_counts[path] += len(records)
+    return _line_counts[path]
+
+def commit(snapshot, records, get_data, write=write_snapshot):
+    """Journal the pending records; compact into the snapshot every COMPACT_EVERY lines.
+    Records are idempotent (whole rows / absolute quantities), so a crash between the
+    snapshot swap and the journal truncate only replays changes that are already applied."""
+    if not records: return
+    if append(snapshot, records) >= COMPACT_EVERY: compact(snapshot, get_data(), write)
+
+def compact(snapshot, data, write=write_snapshot):
+    write(snapshot, data)
+    path = journal_path(snapshot)
+    open(path, "w").close()
+    _line_counts[path] = 0
@@ -1,7 +1,7 @@
 #Importing necessary Python modules for file handling, random generation, timing, and system operations
-import os, json, random, shutil, time
+import os, sys, json, random, shutil, time, argparse
 #import inventory and order modules from the project folder
-import inventory, order  
+import inventory, order, storage, batch_orders, bulk_inventory, stock_alerts, analytics, credentials, instrument, service, branch_sync
 
 USERS_FILE = "users.json"
 
@@ -12,33 +12,36 @@ def clear_screen():
     os.system("cls" if os.name == "nt" else "clear")
 
 def load_users():
-    if not os.path.exists(USERS_FILE): return []
-    with open(USERS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    users = storage.backend.load_users(USERS_FILE)
+    return credentials.UserStore(users if isinstance(users, list) else [])
 
 def save_users(users):
-    with open(USERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(users, f, indent=2, ensure_ascii=False)
+    storage.backend.save_users(USERS_FILE, list(users))
+
+def save_user(user, users, rewrite=False):
+    """Persist one account's changes (login, lockout, password) without rewriting the rest.
+    rewrite=True (a plaintext password was replaced) also rewrites the users file at
+    once, so the old password is not left in it until the next compaction."""
+    with storage.locked():
+        storage.backend.save_user(USERS_FILE, user, list(users))
+        if rewrite: save_users(load_users())
 
 def get_user(username, users): 
-    return next((u for u in users if u["username"].lower()==username.lower()), None)
+    return users.get(username)
 
 def init_system():
     """Initialize data files if missing or empty."""
     users = []
     # Load existing users if possible
-    if os.path.exists(USERS_FILE):
-        try:
-            with open(USERS_FILE, "r", encoding="utf-8") as f:
-                users = json.load(f)
-                if not isinstance(users, list):  # corrupted file
-                    users = []
-        except (json.JSONDecodeError, IOError):
-            users = []
+    try:
+        users = load_users()
+    except (json.JSONDecodeError, IOError, KeyError):  # corrupted file
+        users = []
 
     # If no users found, create default admin
     if not users:
-        users = [{"username": "admin", "password": "1234", "security": [], "lock_until": 0}]
+        users = [{"username": "admin", "security": [], "lock_until": 0}]
+        credentials.set_password(users[0], "1234")
         save_users(users)
         print("✅ Default admin created (admin / 1234)")
         print("💡 You can manage your account in the 'User Management' option.\n")
@@ -51,6 +54,11 @@ def init_system():
         with open(order.ORDERS_FILE, "w") as f:
             json.dump([], f)
     os.makedirs(order.RECEIPTS_DIR, exist_ok=True)
+    if order.recover_checkout():
+        print("⚠️ An interrupted checkout was rolled back.\n")
+    if branch_sync.BRANCH:
+        inventory.refresh(); branch_sync.bootstrap(inventory.inventory, order.load_orders())
+    order.sweep_expired()  # keep only modifiable orders in the open-orders file
 
 # ------------------ Security & Recovery ------------------
 SECURITY_QUESTIONS = [
@@ -88,8 +96,7 @@ def unlock_user(user):
     user["fail_count"] = 0
 
 def generate_fruit_challenge():
-    inventory.load_data()
-    real = [p["name"] for p in inventory.inventory]
+    real = inventory.product_names()
     if len(real) < 2:
         return None
     in_stock = random.sample(real, 2)
@@ -126,10 +133,10 @@ def password_reset_flow(users):
             if ans == q["answer"].lower(): correct+=1
         if correct==len(user["security"]):
             new_pass=input("Enter new password: ").strip()
-            user["password"]=new_pass; unlock_user(user); save_users(users)
+            plain=credentials.set_password(user, new_pass); unlock_user(user); save_user(user, users, plain)
             print("✅ Password reset successful! You can now log in."); pause(); return
         else:
-            secs=lock_user(user); save_users(users)
+            secs=lock_user(user); save_user(user, users)
             print(f"Incorrect. Locked for {secs//60} minutes."); pause(); return
 
     # No security Qs
@@ -141,10 +148,10 @@ def password_reset_flow(users):
         ch=input("Your choice (1-3): ").strip()
         if ch in ["1","2","3"] and options[int(ch)-1]==fake:
             new_pass=input("Enter new password: ").strip()
-            user["password"]=new_pass; unlock_user(user); save_users(users)
+            plain=credentials.set_password(user, new_pass); unlock_user(user); save_user(user, users, plain)
             print("✅ Password reset successful!"); pause(); return
         else:
-            secs=lock_user(user); save_users(users)
+            secs=lock_user(user); save_user(user, users)
             print(f"Incorrect. Locked for {secs//60} minutes."); pause(); return
     else:
         # fallback feature challenge
@@ -154,10 +161,10 @@ def password_reset_flow(users):
         ch=input("Your choice (1-3): ").strip()
         if ch in ["1","2","3"] and options[int(ch)-1]==fake:
             new_pass=input("Enter new password: ").strip()
-            user["password"]=new_pass; unlock_user(user); save_users(users)
+            plain=credentials.set_password(user, new_pass); unlock_user(user); save_user(user, users, plain)
             print("✅ Password reset successful!"); pause(); return
         else:
-            secs=lock_user(user); save_users(users)
+            secs=lock_user(user); save_user(user, users)
             print(f"Incorrect. Locked for {secs//60} minutes."); pause(); return
 
 def erase_all_data_flow(logged_in=False):
@@ -168,8 +175,10 @@ def erase_all_data_flow(logged_in=False):
         else: print("Cancelled.")
         pause(); return
     if confirm!="YES": print("Cancelled."); pause(); return
-    for f in [USERS_FILE, inventory.INVENTORY_FILE, order.ORDERS_FILE]:
-        if os.path.exists(f): os.remove(f)
+    storage.backend.erase([USERS_FILE, inventory.INVENTORY_FILE, order.ORDERS_FILE, analytics.ROLLUPS_FILE])
+    inventory.history.clear(); order.cache.invalidate(); order.order_archive.erase()
+    branch_sync.publish([{"op": "reset"}])
+    order.receipts.flush()
     if os.path.exists(order.RECEIPTS_DIR): shutil.rmtree(order.RECEIPTS_DIR)
     init_system()
     print("✅ System restarted successfully.")
@@ -188,9 +197,9 @@ def manage_account(user, users):
         c=input("Choose (1-5): ").strip()
         if c=="1":
             old=input("Enter old password: ").strip()
-            if old!=user["password"]: print("Incorrect password."); pause(); continue
+            if not credentials.verify(user, old): print("Incorrect password."); pause(); continue
             new=input("Enter new password: ").strip()
-            user["password"]=new; save_users(users)
+            save_user(user, users, credentials.set_password(user, new))
             print("✅ Password changed."); pause()
         elif c=="2":
             print("Choose two security questions:")
@@ -202,7 +211,7 @@ def manage_account(user, users):
                 ans=input("Your answer: ").strip()
                 qs.append({"question":SECURITY_QUESTIONS[int(idx)-1],"answer":ans.lower()})
             if len(qs)==2:
-                user["security"]=qs; save_users(users); print("✅ Saved security questions.")
+                user["security"]=qs; save_user(user, users); print("✅ Saved security questions.")
             pause()
         elif c=="3":
             print(f"Username: {user['username']}")
@@ -224,7 +233,7 @@ def main_menu(user):
         print("2. Manage Inventory (Add/Update/Delete/Undo/Search)")
         print("3. Make New Order")
         print("4. View/Modify/Delete Orders")
-        print("5. Export Inventory")
+        print("5. Import / Export Inventory")
         print("6. Manage Account")
         print("7. Logout")
         print("====================================")
@@ -234,14 +243,15 @@ def main_menu(user):
             while True:
                 clear_screen()
                 print("--- Inventory Management ---")
-                print("1. Add Product\n2. Update Product\n3. Delete Product\n4. Undo Last Change\n5. Search Product\n6. Back")
-                sub=input("Choose (1-6): ").strip()
+                print("1. Add Product\n2. Update Product\n3. Delete Product\n4. Undo / Redo\n5. Search Product\n6. Low Stock Report\n7. Back")
+                sub=input("Choose (1-7): ").strip()
                 if sub=="1": inventory.add_product()
                 elif sub=="2": inventory.update_product()
                 elif sub=="3": inventory.delete_product()
-                elif sub=="4": inventory.undo_last_change()
+                elif sub=="4": inventory.undo_redo()
                 elif sub=="5": inventory.search_product()
-                elif sub=="6": break
+                elif sub=="6": inventory.low_stock_report()
+                elif sub=="7": break
                 else: print("Invalid."); pause()
         elif choice=="3": order.make_order(user["username"])
         elif choice=="4":
@@ -251,8 +261,9 @@ def main_menu(user):
                 print("1. View Orders")
                 print("2. Modify Order")
                 print("3. Delete Order")
-                print("4. Back")
-                sub = input("Choose (1-4): ").strip()
+                print("4. Sales Report")
+                print("5. Back")
+                sub = input("Choose (1-5): ").strip()
                 if sub == "1":
                     order.view_orders()
                 elif sub == "2":
@@ -260,22 +271,40 @@ def main_menu(user):
                 elif sub == "3":
                     order.modify_order()  # internally supports delete choice
                 elif sub == "4":
+                    order.show_sales_report()
+                elif sub == "5":
                     break
                 else:
                     print("Invalid option.")
                     pause()
 
-        elif choice=="5":
-            name=input("Enter export filename (or 'cancel'): ").strip()
-            if name.lower()=="cancel" or not name: print("Cancelled."); pause(); continue
-            data=inventory.inventory
-            with open(name if name.endswith(".json") else name+".json","w",encoding="utf-8") as f:
-                json.dump(data,f,indent=2)
-            print(f"✅ Exported to {name}.json"); pause()
+        elif choice=="5": import_export_flow()
         elif choice=="6": manage_account(user, load_users())
         elif choice=="7": print("Goodbye!"); break
         else: print("Invalid."); pause()
 
+def import_export_flow():
+    formats = ", ".join(bulk_inventory.FORMATS)
+    print("1. Export Inventory\n2. Import Inventory (add new products, update existing ones by name)\n3. Back")
+    ch = input("Choose (1-3): ").strip()
+    if ch not in ("1", "2"): return
+    name = input(f"Filename ({formats}; 'cancel' to abort): ").strip()
+    if name.lower()=="cancel" or not name: print("Cancelled."); pause(); return
+    if ch == "1":
+        if os.path.splitext(name)[1].lower() not in bulk_inventory.FORMATS: name += ".json"
+        n = bulk_inventory.export_inventory(name)
+        print(f"✅ Exported {n} products to {name}"); pause(); return
+    try:
+        summary = bulk_inventory.import_inventory(name, on_chunk=lambda n, s: print(f"{n} rows read...", end="\r"))
+    except (OSError, ValueError) as e: print(f"\nImport failed: {e}"); pause(); return
+    print(); print_import_summary(summary); pause()
+
+def print_import_summary(summary):
+    for r in summary["rejected"][:20]: print(f"Row {r['row']}: {r['error']}")
+    if len(summary["rejected"]) > 20: print(f"... and {len(summary['rejected']) - 20} more rejected rows")
+    print(f"✅ Added {summary['added']}, updated {summary['updated']}, unchanged {summary['unchanged']}, "
+          f"rejected {len(summary['rejected'])}.")
+
 # ------------------ Login ------------------
 def login_flow():
     users = load_users()
@@ -293,12 +322,13 @@ def login_flow():
             username = input("Username: ").strip()
             password = input("Password: ").strip()
             u = get_user(username, users)
-            if not u or u["password"] != password:
+            if not credentials.verify(u, password):
                 print("Invalid credentials."); pause(); continue
             if time.time() < u.get("lock_until", 0):
                 print("Account locked temporarily."); pause(); continue
-            unlock_user(u); save_users(users)
-            inventory.load_data()
+            plain=credentials.needs_upgrade(u) and credentials.set_password(u, password)
+            unlock_user(u); save_user(u, users, plain)
+            inventory.refresh()
             main_menu(u)
 
         elif ch == "2":
@@ -314,9 +344,10 @@ def login_flow():
                 password = input("Choose a password: ").strip()
                 if not password:
                     print("Password cannot be blank."); continue
-                new_user = {"username": username, "password": password, "security": [], "lock_until": 0}
-                users.append(new_user)
-                save_users(users)
+                new_user = {"username": username, "security": [], "lock_until": 0}
+                credentials.set_password(new_user, password)
+                users.add(new_user)
+                save_user(new_user, users)
                 print("✅ Account created successfully!")
                 print("💡 You can manage your account and add security questions later from User Management.")
                 pause()
@@ -334,8 +365,114 @@ def login_flow():
         else:
             print("Invalid."); pause()
 
+# ------------------ Command line ------------------
+def run_cli(argv):
+    parser = argparse.ArgumentParser(prog="main.py", description="Hami MiniMarket (no arguments starts the menu; "
+                                     "--profile FILE / --cprofile FILE before any command record timings)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("import-orders", help="Check out orders from a JSONL or CSV file without prompts")
+    p.add_argument("file")
+    p.add_argument("--user", help="username for orders that do not name one")
+    p.add_argument("--batch-size", type=int, default=500, help="orders committed per save (default 500)")
+    p.add_argument("--discount", action="store_true", help=f"apply the {int(order.DISCOUNT_RATE*100)}%% discount to eligible orders")
+    p = sub.add_parser("reorder", help="Write reorder suggestions from sales velocity (CSV or JSON)")
+    p.add_argument("--days", type=int, default=30, help="sales history window in days (default 30)")
+    p.add_argument("--lead-time", type=int, default=3, help="supplier lead time in days (default 3)")
+    p.add_argument("--cover", type=int, default=14, help="days of sales to stock for after delivery (default 14)")
+    p.add_argument("--output", default="reorder.csv")
+    p = sub.add_parser("report", help="Sales report (revenue, top products, categories, users, hours)")
+    p.add_argument("--from", dest="start", help="first day, YYYY-MM-DD")
+    p.add_argument("--to", dest="end", help="last day, YYYY-MM-DD")
+    p.add_argument("--top", type=int, default=10, help="rows shown per table (default 10)")
+    p.add_argument("--output", help="write the report to a .json file, or one table to a .csv file")
+    p.add_argument("--by", choices=sorted(analytics.EXPORTS), default="day", help="table written to CSV (default day)")
+    p = sub.add_parser("import-inventory", help="Add or update products from a CSV, JSONL, JSON or .bin file")
+    p.add_argument("file")
+    p.add_argument("--chunk-size", type=int, default=bulk_inventory.CHUNK_SIZE, help="rows validated per chunk")
+    p = sub.add_parser("export-inventory", help="Write the inventory to a CSV, JSONL, JSON or .bin file")
+    p.add_argument("file")
+    p = sub.add_parser("stock-summary", help="Total stock value and products / units per category")
+    p = sub.add_parser("sync", help="Pull the branches' new changes into the consolidated head-office view")
+    p.add_argument("--show", action="store_true", help="print consolidated stock and sales per branch")
+    p.add_argument("--output", help="write the consolidated stock to a .csv or .json file")
+    p.add_argument("--verify", action="store_true", help="also rebuild the view from all logs in both orders and compare")
+    p = sub.add_parser("serve", help="Run the local HTTP/JSON service for tills and dashboards")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args(argv)
+
+    if args.command == "import-orders":
+        if args.user and not get_user(args.user, load_users()): print("User not found."); return 1
+        summary = batch_orders.import_orders(args.file, args.user, args.batch_size, args.discount,
+                                             on_batch=lambda s: print(f"Committed {s['committed']} orders..."))
+        for r in summary["rejected"]: print(f"Rejected order {r['ref']}: {r['error']}")
+        print(f"✅ Imported {summary['committed']} orders, rejected {len(summary['rejected'])}.")
+        return 0
+
+    if args.command == "reorder":
+        inventory.load_data()
+        rows = stock_alerts.reorder_suggestions(inventory.inventory, order.iter_orders(since=time.strftime("%Y-%m-%d", time.localtime(time.time() - args.days * 86400)), archived=True), args.days, args.lead_time, args.cover)
+        stock_alerts.write_suggestions(args.output, rows)
+        print(f"✅ {len(rows)} reorder suggestions written to {args.output}")
+        return 0
+
+    if args.command == "import-inventory":
+        try: summary = bulk_inventory.import_inventory(args.file, args.chunk_size)
+        except (OSError, ValueError) as e: print(f"Import failed: {e}"); return 1
+        print_import_summary(summary)
+        return 0
+
+    if args.command == "export-inventory":
+        try: n = bulk_inventory.export_inventory(args.file)
+        except (OSError, ValueError) as e: print(f"Export failed: {e}"); return 1
+        print(f"✅ Exported {n} products to {args.file}")
+        return 0
+
+    if args.command == "stock-summary":
+        s = inventory.stock_summary()
+        print(f"Products: {s['products']} | Stock value: ${s['value']:.2f}")
+        print(f"\n{'Category':<20}{'Products':<10}Units")
+        for r in s["categories"]: print(f"{r['category']:<20}{r['products']:<10}{r['quantity']}")
+        return 0
+
+    if args.command == "sync":
+        applied = branch_sync.sync()
+        for b, n in sorted(applied.items()): print(f"{b}: {n} changes")
+        print(f"✅ Synced {sum(applied.values())} changes from {len(applied)} branches.")
+        view = branch_sync.load_view()
+        rows = branch_sync.stock_rows(view)
+        if args.show:
+            print(f"\n{'Name':<20}{'Category':<15}{'Price':<10}{'Total':<8}Per branch")
+            for r in rows:
+                print(f"{r['name']:<20}{r['category']:<15}{r['price']:<10}{r['total']:<8}" + ", ".join(f"{b}: {q}" for b, q in r["branches"].items()))
+            print()
+            for r in branch_sync.sales_rows(view): print(f"{r['branch']}: {r['orders']} orders, ${r['revenue']:.2f}")
+        if args.output:
+            branch_sync.write_stock(args.output, rows); print(f"✅ Consolidated stock written to {args.output}")
+        if args.verify:
+            diff = branch_sync.verify()
+            if diff: print(f"⚠️ The view depends on the order the logs were read in: {', '.join(diff)} differ."); return 1
+            print("✅ Rebuilding the view from the logs in either order gives the same result.")
+        return 0
+
+    if args.command == "serve":
+        service.serve(args.host, args.port)
+        return 0
+
+    if args.command == "report":
+        inventory.load_data()
+        rep = order.sales_report(args.start, args.end)
+        order.print_sales_report(rep, args.top)
+        if args.output:
+            analytics.write_report(args.output, rep, args.by)
+            print(f"✅ Report written to {args.output}")
+        return 0
+
 # ------------------ Entry ------------------
 if __name__=="__main__":
+    argv = instrument.setup(sys.argv[1:])
     init_system()
+    if argv: sys.exit(run_cli(argv))
+    if order.SWEEP_SECONDS: order.expiry.start_sweeper(order.sweep_expired, order.SWEEP_SECONDS)
     login_flow()
 
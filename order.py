@@ -1,101 +1,301 @@
 # Importing modules for file handling and JSON data operations
-import json, os
-from datetime import datetime, timedelta
-from inventory import inventory, save_data, pause, get_valid_number
+import copy, itertools, json, os, time
+from datetime import datetime
+import storage, journal, reservations, pricing, receipts, expiry, analytics, paging, datastore, order_archive, branch_sync
+from receipts import RECEIPTS_DIR
+from pricing import TAX_RATE, DISCOUNT_THRESHOLD, DISCOUNT_RATE, price_cart
+import inventory as inventory_module
+from inventory import inventory, store, save_data, adjust_stock, pause, get_valid_number, history, INVENTORY_FILE
 
 ORDERS_FILE = "orders.json"
-RECEIPTS_DIR = "receipts"
-TAX_RATE = 0.05
-DISCOUNT_THRESHOLD = 20.0
-DISCOUNT_RATE = 0.10
 MODIFY_WINDOW_MINUTES = 60
+CHECKOUT_LOG = "checkout.pending"
+SWEEP_SECONDS = int(os.environ.get("HAMI_SWEEP_SECONDS", "0"))
 os.makedirs(RECEIPTS_DIR, exist_ok=True)
+pending_orders = []
+expiry_index = expiry.ExpiryIndex()
+_committing = False
+
+def log_order(op, order=None, order_id=None, archived=False):
+    rec={"op":op,"order":order} if order is not None else {"op":op,"order_id":order_id}
+    if archived: rec["archived"]=True  # moved to the archive, not cancelled
+    pending_orders.append(rec)
+    if op=="order_delete": expiry_index.discard(order_id)
+    else: expiry_index.add(order)
 
 def save_orders(orders):
-    with open(ORDERS_FILE,"w",encoding="utf-8") as f:
-        json.dump(orders,f,indent=2,ensure_ascii=False)
+    changes=pending_orders[:]; pending_orders.clear()
+    with storage.locked():
+        try:
+            if orders is not cache.data or not cache.fresh():
+                # another process wrote since this list was loaded: apply our changes on top of its orders
+                orders[:]=storage.replay_orders(storage.backend.load_orders(ORDERS_FILE), changes)
+                for o in orders: _normalize(o)
+                expiry_index.rebuild(orders)
+            storage.backend.save_orders(ORDERS_FILE, orders, changes)
+            branch_sync.publish(changes)
+        except BaseException:
+            cache.invalidate(); raise
+        cache.saved(orders)
+
+def _read_orders(path):
+    data=storage.backend.load_orders(path)
+    for o in data: _normalize(o)
+    expiry_index.rebuild(data)
+    return data
+
+cache = datastore.CachedFile(ORDERS_FILE, _read_orders)
 
 def load_orders():
-    if not os.path.exists(ORDERS_FILE): return []
-    with open(ORDERS_FILE,"r",encoding="utf-8") as f:
-        data=json.load(f)
-        for o in data:
-            o["subtotal"]=float(o.get("subtotal",0))
-            o["tax"]=float(o.get("tax",0))
-            o["discount"]=float(o.get("discount",0))
-            o["total"]=float(o.get("total",0))
-        return data
+    """All orders. The parsed list is shared and kept until the file changes on disk,
+    so callers that change it must save it (save_orders) or call cache.invalidate()."""
+    return cache.get()
+
+def iter_orders(username=None, since=None, until=None, archived=False):
+    """Saved orders one at a time (for listings and reports): from the loaded orders if
+    they are current, otherwise streamed from the file without loading all of it.
+    since/until are timestamps or 'YYYY-MM-DD' days, both inclusive. With archived=True
+    the archived orders come first (oldest first), then the open ones."""
+    if until is not None and len(until)==10: until+=" 23:59:59"
+    if archived:
+        hot=list(iter_orders(username, since, until)); ids={o['order_id'] for o in hot}
+        # an order archived just before a crash can still be in the hot tier too
+        return itertools.chain((o for o in order_archive.iter_orders(username, since, until) if o['order_id'] not in ids), hot)
+    with storage.locked():
+        if cache.fresh():
+            rows=list(cache.data)
+            if username is None and since is None and until is None: return iter(rows)
+            return (o for o in rows if (username is None or o["username"].lower()==username.lower())
+                    and (since is None or o["timestamp"]>=since) and (until is None or o["timestamp"]<=until))
+    return map(_normalize, storage.backend.iter_orders(ORDERS_FILE, username, since, until))
+
+def _normalize(o):
+    for f in ("subtotal","tax","discount","total"): o[f]=float(o.get(f,0))
+    return o
 
 def now_str(): return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 def now_for_filename(): return datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-def is_expired(ts): return datetime.now()-datetime.strptime(ts,"%Y-%m-%d %H:%M:%S") >= timedelta(minutes=MODIFY_WINDOW_MINUTES)
-def minutes_remaining(ts): return max(0,int(MODIFY_WINDOW_MINUTES - (datetime.now()-datetime.strptime(ts,"%Y-%m-%d %H:%M:%S")).total_seconds()//60))
-
-def next_order_id(orders):
-    if not orders: return "ORD_001"
-    nums=[int(o["order_id"].split("_")[1]) for o in orders if "_" in o.get("order_id","") and o["order_id"].split("_")[1].isdigit()]
-    return f"ORD_{max(nums)+1:03d}" if nums else "ORD_001"
-
-def write_receipt(order):
-    path=os.path.join(RECEIPTS_DIR,order["receipt_file"])
-    with open(path,"w",encoding="utf-8") as f:
-        f.write("Hami MiniMarket - Receipt\n")
-        f.write(f"Order ID: {order['order_id']}\nUser: {order['username']}\nTimestamp: {order['timestamp']}\n\n")
-        f.write(f"{'Name':<15}{'Qty':<6}{'Price':<10}{'Line':<12}\n"); f.write("-"*50+"\n")
-        for i in order["products"]:
-            f.write(f"{i['name']:<15}{i['quantity']:<6}{i['price']:<10.2f}{i['price']*i['quantity']:<12.2f}\n")
-        f.write("-"*50+"\n")
-        f.write(f"Subtotal: ${order['subtotal']:.2f}\nTax: ${order['tax']:.2f}\nDiscount: ${order['discount']:.2f}\nTotal: ${order['total']:.2f}\n")
-    return path
+def is_expired(ts): return time.time()-expiry.parse_ts(ts) >= MODIFY_WINDOW_MINUTES*60
+def minutes_remaining(ts): return max(0,int(MODIFY_WINDOW_MINUTES - (time.time()-expiry.parse_ts(ts))//60))
+
+def order_number(oid):
+    """Numeric part of an order ID (ORD_007 -> 7); use as a sort key, since IDs past ORD_999 do not sort as text."""
+    tail=oid.rsplit("_",1)[-1]
+    return int(tail) if tail.isdigit() else 0
+
+def allocate_order_ids(n=1, orders=None):
+    """Reserve n consecutive order IDs from the persistent sequence (safe across processes).
+    The sequence is recovered from the highest existing ID the first time it is needed,
+    and never hands out an ID at or below one in `orders` or the archive (a restored or
+    imported orders file can be ahead of it)."""
+    with storage.locked():
+        last=storage.backend.read_seq(ORDERS_FILE)
+        if last is None or orders is not None:
+            last=max(last or 0, max((order_number(o.get("order_id","")) for o in (iter_orders() if orders is None else orders)), default=0))
+            last=max(last, order_archive.last_number())
+        storage.backend.write_seq(ORDERS_FILE, last+n)
+    return [f"ORD_{i:03d}" for i in range(last+1, last+n+1)]
+
+def next_order_id(orders=None): return allocate_order_ids(1, orders)[0]
+
+def write_receipt(order): return receipts.submit(order)
+
+# ------------------ Checkout transactions ------------------
+class CheckoutError(Exception): pass
+class CheckoutInputError(CheckoutError): pass   # bad or missing values, as opposed to a conflict
+
+class CheckoutTransaction:
+    """Stage one or more checkouts against current stock, then commit stock, orders and
+    receipts together. Before anything is written, the stock deltas, order IDs, receipt
+    names and the inventory version are recorded in CHECKOUT_LOG; if the commit fails or
+    the process dies, the record is rolled back by recover_checkout(), which runs at
+    startup and before every inventory save (from any till), so another till's checkout
+    never discards it. The stock is put back only if the inventory has been written since
+    the version recorded.
+    `owner` is the reservation owner whose cart holds this transaction consumes."""
+    def __init__(self, orders=None, owner=None):
+        self.orders = load_orders() if orders is None else orders
+        self.owner = owner
+        self.held = {}
+        self.staged = []
+        self.others = None
+
+    def available(self, product):
+        # other tills' holds are read once per transaction; commit() re-checks them
+        if self.others is None: self.others = reservations.held(exclude=self.owner)
+        k = store.key(product['name'])
+        return product['quantity'] - self.others.get(k, 0) - self.held.get(k, 0)
+
+    def rollback(self):
+        """Drop everything staged; nothing has been written yet."""
+        self.staged, self.held, self.others = [], {}, None
+
+    def validate(self, cart):
+        need = {}
+        for item in cart:
+            p = store.get(item['name'])
+            if not p: raise CheckoutInputError(f"Unknown product: {item['name']}")
+            if item['quantity'] <= 0: raise CheckoutInputError(f"Invalid quantity for {p['name']}")
+            k = store.key(p['name']); need[k] = need.get(k, 0) + item['quantity']
+            if need[k] > self.available(p): raise CheckoutError(f"Not enough stock for {p['name']}")
+        return need
+
+    def add(self, username, cart, apply_discount=False):
+        need = self.validate(cart)
+        for k, q in need.items(): self.held[k] = self.held.get(k, 0) + q
+        subtotal, tax, disc, total = price_cart(cart, apply_discount)
+        # order_id and receipt name are assigned at commit, under the store lock
+        order = {'order_id':None,'username':username,'products':cart,'subtotal':subtotal,'tax':tax,'discount':disc,
+                 'total':total,'timestamp':now_str(),'receipt_file':None,'discount_opt_in':bool(apply_discount)}
+        self.staged.append(order)
+        return order
+
+    def commit(self):
+        global _committing
+        if not self.staged: return []
+        with storage.locked():
+            recover_checkout()  # left by a till that died mid-commit
+            # re-check against what other tills have sold or reserved meanwhile
+            inventory_module.refresh()
+            self.orders = load_orders()  # the cached list, re-read only if another process wrote
+            others = reservations.held(exclude=self.owner)
+            for k, q in self.held.items():
+                p = store.by_name.get(k)
+                if not p or q > p['quantity'] - others.get(k, 0):
+                    raise CheckoutError(f"Not enough stock for {p['name'] if p else k}")
+            names = set()
+            for oid, o in zip(allocate_order_ids(len(self.staged), self.orders), self.staged):
+                o['order_id'] = oid
+                o['receipt_file'] = f"receipt_{o['username']}_{now_for_filename()}.txt"
+                if o['receipt_file'] in names or receipts.exists(o['receipt_file']): o['receipt_file'] = o['receipt_file'][:-4] + f"_{o['order_id']}.txt"
+                names.add(o['receipt_file'])
+                self.orders.append(o); log_order("order_create", o)
+            journal.write_snapshot(CHECKOUT_LOG, {
+                "stock": [{"name": store.by_name[k]['name'], "delta": -q} for k, q in self.held.items()],
+                "inventory_version": _stamp(storage.backend.version(INVENTORY_FILE)),
+                "order_ids": [o['order_id'] for o in self.staged], "receipts": [o['receipt_file'] for o in self.staged]})
+            _committing = True
+            try:
+                with history.group("Checkout " + ", ".join(o['order_id'] for o in self.staged)):
+                    for k, q in self.held.items(): adjust_stock(store.by_name[k], -q)
+                    for o in self.staged: _record_order(None, o)
+                    save_data()
+                    save_orders(self.orders)
+                    for o in self.staged: write_receipt(o)
+                    receipts.wait(o['receipt_file'] for o in self.staged)  # on disk before the intent goes
+            except BaseException:
+                _committing = False
+                inventory_module.pending_changes.clear(); pending_orders.clear(); cache.invalidate()
+                recover_checkout(); inventory_module.load_data()
+                raise
+            _committing = False
+            os.remove(CHECKOUT_LOG)
+            if self.owner: reservations.release(self.owner)
+        committed = self.staged
+        self.rollback()
+        return committed
+
+def _stamp(version): return json.loads(json.dumps(version))  # as it reads back from CHECKOUT_LOG
+
+def recover_checkout():
+    """Undo a checkout commit that did not finish. Safe to run repeatedly; does nothing
+    while this process is committing one."""
+    if _committing or not os.path.exists(CHECKOUT_LOG): return False
+    with storage.locked(): return _rollback_checkout()
+
+def _rollback_checkout():
+    with open(CHECKOUT_LOG, "r", encoding="utf-8") as f: intent = json.load(f)
+    if _stamp(storage.backend.version(INVENTORY_FILE)) != intent["inventory_version"]:
+        # the stock was saved (every save runs this first, so no other write can come
+        # between): undo only our own deltas on the saved data, leaving loaded stores to refresh()
+        rows = storage.backend.load_inventory(INVENTORY_FILE)
+        have = {storage.name_key(r["name"]) for r in rows}
+        changes = storage.rebase_inventory(rows, [{"op": "stock", "name": s["name"], "quantity": 0, "delta": -s["delta"]}
+                                                  for s in intent["stock"] if storage.name_key(s["name"]) in have])
+        storage.backend.save_inventory(INVENTORY_FILE, storage.replay_inventory(rows, changes), changes)
+        branch_sync.publish(changes)
+    # only our orders: an ID that turned out to be taken keeps the order that had it
+    orders = load_orders(); ours = set(zip(intent["order_ids"], intent["receipts"]))
+    ids = {o['order_id'] for o in orders if (o['order_id'], o.get('receipt_file')) in ours}
+    for oid in ids: log_order("order_delete", order_id=oid)
+    save_orders([o for o in orders if o['order_id'] not in ids])
+    receipts.remove(intent["receipts"])
+    os.remove(CHECKOUT_LOG)
+    return True
+
+inventory_module.before_save.append(recover_checkout)
 
 def make_order(username):
-    orders=load_orders(); cart=[]
+    owner=reservations.new_owner(username)
+    try: _make_order(username, owner)
+    finally: reservations.release(owner)
+
+def _make_order(username, owner):
+    sweep_expired(); inventory_module.refresh(); orders=load_orders(); cart=[]
     if not inventory: print("No products."); pause(); return
     print("Available products:")
-    for i,p in enumerate(inventory,1): print(f"{i}. {p['name']} - ${p['price']} ({p['quantity']} in stock)")
+    others=reservations.held(exclude=owner)  # one read of the holds file for the whole listing
+    for i,p in enumerate(inventory,1): print(f"{i}. {p['name']} - ${p['price']} ({p['quantity']-others.get(store.key(p['name']),0)} in stock)")
     while True:
         name=input("Enter product name to add (or 'done'/'cancel'): ").strip()
         if name.lower()=="done": break
         if name.lower()=="cancel": print("Cancelled."); return
-        prod=next((p for p in inventory if p['name'].lower()==name.lower()),None)
+        prod=store.get(name)
         if not prod: print("Not found."); continue
-        qty=get_valid_number(f"Enter quantity (available {prod['quantity']}): ", is_int=True)
+        qty=get_valid_number(f"Enter quantity (available {reservations.available(prod, owner)}): ", is_int=True)
         if qty=="cancel": return
-        if qty>prod['quantity']: print("Not enough stock."); continue
+        if qty<=0: print("Quantity must be positive."); continue
+        try: reservations.place(owner, prod['name'], qty)
+        except reservations.HoldError as e: print(e); continue
         cart.append({'name':prod['name'],'price':prod['price'],'quantity':qty}); print(f"Added {qty} x {prod['name']}")
     if not cart: print("Empty order."); pause(); return
-    subtotal=sum(i['price']*i['quantity'] for i in cart); tax=subtotal*TAX_RATE; disc=0.0
-    if subtotal>DISCOUNT_THRESHOLD and input(f"Apply {int(DISCOUNT_RATE*100)}% discount? (y/n): ").strip().lower()=="y": disc=subtotal*DISCOUNT_RATE
-    total=subtotal+tax-disc; print(f"Subtotal:${subtotal:.2f}\nTax:${tax:.2f}\nDiscount:${disc:.2f}\nTotal:${total:.2f}")
+    apply_discount=price_cart(cart)[0]>DISCOUNT_THRESHOLD and input(f"Apply {int(DISCOUNT_RATE*100)}% discount? (y/n): ").strip().lower()=="y"
+    subtotal,tax,disc,total=price_cart(cart, apply_discount); print(f"Subtotal:${subtotal:.2f}\nTax:${tax:.2f}\nDiscount:${disc:.2f}\nTotal:${total:.2f}")
     if input("Confirm order and reduce inventory? (y/n): ").strip().lower()!="y": print("Cancelled."); pause(); return
-    for item in cart:
-        for p in inventory:
-            if p['name'].lower()==item['name'].lower(): p['quantity']-=item['quantity']; break
-    save_data()
-    order={'order_id':next_order_id(orders),'username':username,'products':cart,'subtotal':subtotal,'tax':tax,'discount':disc,'total':total,'timestamp':now_str(),'receipt_file':f"receipt_{username}_{now_for_filename()}.txt"}
-    orders.append(order); save_orders(orders); path=write_receipt(order); print(f"Receipt saved: {path}"); pause()
+    tx=CheckoutTransaction(orders, owner)
+    try:
+        order=tx.add(username, cart, apply_discount); tx.commit()
+    except CheckoutError as e: print(e); pause(); return
+    print(f"Receipt saved: {receipts.location(order['receipt_file'])}"); pause()
 
-def view_orders():
-    orders=load_orders()
-    if not orders: print("No orders."); pause(); return
-    for o in orders:
+ORDER_SORTS = {"date": lambda o: (o['timestamp'], order_number(o['order_id'])), "total": lambda o: o['total'],
+               "id": lambda o: order_number(o['order_id']), "user": lambda o: o['username'].lower()}
+
+def order_pager(sort=None, reverse=False, user=None, since=None, until=None, size=paging.PAGE_SIZE, archived=False):
+    return paging.Pager(lambda: iter_orders(user, since, until, archived), size, ORDER_SORTS.get(sort), reverse)
+
+def show_orders(rows, first=1):
+    for o in rows:
         print(f"\nID:{o['order_id']} | User:{o['username']} | Date:{o['timestamp']} | Total:${o['total']:.2f}")
         if is_expired(o['timestamp']): print("Status: Expired (cannot modify)")
         else: print(f"Time left: {minutes_remaining(o['timestamp'])} minutes")
 
+def show_order_summaries(rows, first=1):
+    for o in rows:
+        prod_names = ", ".join(p['name'] for p in o.get('products',[])[:5])
+        print(f"ID:{o['order_id']} | User:{o.get('username')} | Date:{o.get('timestamp')} | Products:{prod_names} | Total:${o.get('total',0):.2f}")
+
+def view_orders():
+    opts=input("Sort by date/total/id/user ('-' for descending), filter with user=NAME from=YYYY-MM-DD to=YYYY-MM-DD (blank = all): ").strip()
+    try:
+        sort,reverse,f=paging.parse_options(opts, ORDER_SORTS, ("user","from","to"))
+        for d in (f.get("from"), f.get("to")):
+            if d: datetime.strptime(d, "%Y-%m-%d")
+    except ValueError as e: print(f"Invalid option: {e}"); pause(); return
+    if not paging.browse(order_pager(sort, reverse, f.get("user"), f.get("from"), f.get("to"), archived=True), show_orders): print("No orders.")
+    pause()
+
 def list_orders_summary():
-    orders=load_orders()
-    if not orders: print("No orders."); pause(); return []
+    """Page through order summaries, newest first; returns how many were listed."""
     print("--- Existing Orders ---")
-    for o in orders:
-        prod_names = ", ".join([p['name'] for p in o.get('products',[])][:5])
-        print(f"ID:{o['order_id']} | User:{o.get('username')} | Date:{o.get('timestamp')} | Products:{prod_names} | Total:${o.get('total',0):.2f}")
-    return orders
+    n=paging.browse(order_pager("date", True), show_order_summaries)
+    if not n: print("No orders."); pause()
+    return n
 
 def find_order_by_id(orders, oid): return next((o for o in orders if o['order_id']==oid), None)
 
 def modify_order():
-    orders=load_orders()
+    sweep_expired(); inventory_module.refresh(); orders=load_orders()
     if not orders: print("No orders."); pause(); return
     list_orders_summary()
     oid=input("Enter Order ID to modify (or 'cancel'): ").strip()
@@ -108,12 +308,9 @@ def modify_order():
     if action=="cancel": print("Cancelled."); pause(); return
     if action=="delete":
         if input("Confirm deletion (y/n): ").lower()=="y":
-            for item in o['products']:
-                for p in inventory:
-                    if p['name'].lower()==item['name'].lower(): p['quantity']+=item['quantity']
-            path=os.path.join(RECEIPTS_DIR,o['receipt_file'])
-            if os.path.exists(path): os.remove(path)
-            orders=[x for x in orders if x['order_id']!=oid]; save_orders(orders); save_data(); print("Order deleted."); pause(); return
+            try: cancel_order(oid)  # re-checked under the lock: another till may have changed it meanwhile
+            except CheckoutError as e: print(e); pause(); return
+            print("Order deleted."); pause(); return
         else: print("Cancelled."); pause(); return
     if action=="edit":
         idx_choice=get_valid_number("Enter item number to edit (or 'cancel'): ", is_int=True)
@@ -123,23 +320,160 @@ def modify_order():
         new_qty=get_valid_number("Enter new quantity (leave blank to keep): ", allow_blank=True, is_int=True)
         if new_qty=="cancel": print("Cancelled."); pause(); return
         if new_qty is None: print("No change."); pause(); return
-        for p in inventory:
-            if p['name'].lower()==item['name'].lower():
-                p['quantity'] += item['quantity']
-                if new_qty > p['quantity']: print("Not enough stock."); p['quantity'] -= item['quantity']; pause(); return
-                p['quantity'] -= new_qty; break
+        try: change_order_item(oid, item['name'], new_qty)
+        except CheckoutError as e: print(e); pause(); return
+        print("Order updated."); pause(); return
+
+def _record_order(before, after):
+    """Add an order change to the history entry being recorded, so undoing the entry
+    puts the order back as well as its stock (see undo_history)."""
+    history.record({"op": "order", "before": copy.deepcopy(before), "after": copy.deepcopy(after)}, "")
+
+def _delete_order(orders, o):
+    with history.group(f"Delete order {o['order_id']}"):
+        for item in o['products']:
+            p=store.get(item['name'])
+            if p: adjust_stock(p, item['quantity'])
+        _record_order(o, None)
+    receipts.remove([o['receipt_file']])
+    orders[:]=[x for x in orders if x['order_id']!=o['order_id']]; log_order("order_delete", order_id=o['order_id']); save_orders(orders); save_data()
+
+def _set_quantity(orders, o, item, new_qty):
+    p=store.get(item['name']); before=copy.deepcopy(o)
+    if p and new_qty > reservations.available(p)+item['quantity']: raise CheckoutError("Not enough stock.")
+    with history.group(f"Modify order {o['order_id']} ({item['name']} {item['quantity']} -> {new_qty})"):
+        if p: adjust_stock(p, item['quantity']-new_qty)
         item['quantity']=new_qty
-        subtotal = sum(it['price']*it['quantity'] for it in o['products'])
-        o['subtotal']=subtotal; o['tax']=subtotal*TAX_RATE; o['discount']=subtotal*DISCOUNT_RATE if subtotal>DISCOUNT_THRESHOLD else 0.0
-        o['total']=o['subtotal']+o['tax']-o['discount']; o['timestamp']=now_str(); write_receipt(o); save_orders(orders); save_data(); print("Order updated."); pause(); return
+        o['discount_opt_in']=pricing.discount_opted_in(o); pricing.reprice_orders([o]); o['timestamp']=now_str()
+        _record_order(before, o)
+    write_receipt(o); log_order("order_modify", o); save_orders(orders); save_data()
+
+def _open_order(oid):
+    """Current stock and orders plus the order to change; call with the store lock held
+    until the change is saved, so the checks still hold when it is written."""
+    inventory_module.refresh(); orders=load_orders(); o=find_order_by_id(orders, oid)
+    if not o: raise CheckoutError("Not found.")
+    if is_expired(o['timestamp']): raise CheckoutError("Expired - cannot modify.")
+    return orders, o
+
+def cancel_order(oid):
+    """Delete an order still inside the modify window and put its stock back (no prompts)."""
+    with storage.locked():
+        orders,o=_open_order(oid); _delete_order(orders, o)
+
+def change_order_item(oid, name, new_qty):
+    """Set the quantity of one product in an open order (no prompts); returns the order."""
+    with storage.locked():
+        orders,o=_open_order(oid)
+        item=next((i for i in o['products'] if store.key(i['name'])==store.key(name)), None)
+        if not item: raise CheckoutInputError(f"{name} is not in this order.")
+        if new_qty<0: raise CheckoutInputError("Quantity must not be negative.")
+        _set_quantity(orders, o, item, new_qty)
+        return o
+
+# ------------------ Undo / redo of order changes ------------------
+# A history entry made by a checkout, an order edit or a cancellation holds the
+# stock moves plus {"op": "order", "before", "after"} (None = no such order).
+# inventory._replay() asks undo_conflict() first, applies the stock moves, then
+# calls undo_apply() to put the orders in their other state.
+def _sides(change, forward): return (change["before"], change["after"]) if forward else (change["after"], change["before"])
+
+def undo_conflict(changes, forward):
+    """Why these order changes cannot be undone (forward=False) or redone now, or None.
+    An order that has since been archived, edited or deleted, or that is past its edit
+    window, is not touched. Raises inventory.ProductError if there is too little stock
+    to restore it."""
+    orders=load_orders(); need={}
+    for c in changes:
+        have,want=_sides(c, forward); oid=(have or want)['order_id']
+        cur=find_order_by_id(orders, oid)
+        if have is None and (cur is not None or order_archive.find(oid)): return f"{oid} exists"
+        if have is not None and (cur is None or (cur['timestamp'],cur['products'])!=(have['timestamp'],have['products'])):
+            return f"{oid} has been archived or changed since"
+        if any(o is not None and is_expired(o['timestamp']) for o in (cur, want)): return f"{oid} is past its edit window"
+        for o,sign in ((want,1),(have,-1)):
+            for i in (o['products'] if o else []): need[store.key(i['name'])]=need.get(store.key(i['name']),0)+sign*i['quantity']
+    others=reservations.held()
+    for k,q in need.items():
+        p=store.by_name.get(k)
+        if p and q>0 and q>p['quantity']-others.get(k,0): raise inventory_module.ProductError(f"Not enough {p['name']} in stock to restore the order.")
+    return None
+
+def undo_apply(changes, forward):
+    orders=load_orders()
+    for c in changes:
+        have,want=_sides(c, forward); oid=(have or want)['order_id']
+        orders[:]=[o for o in orders if o['order_id']!=oid]
+        if want is None: receipts.remove([have['receipt_file']]); log_order("order_delete", order_id=oid)
+        else:
+            o=_normalize(copy.deepcopy(want)); orders.append(o); write_receipt(o)
+            log_order("order_modify" if have else "order_create", o)
+    save_orders(orders)
+
+def sweep_expired():
+    """Move orders past the edit window from the open orders into the archive (see
+    order_archive.py). Only orders popped from the expiry heap are touched. Returns the
+    number of orders archived."""
+    with storage.locked():
+        orders=load_orders()
+        ids=set(expiry_index.pop_expired(time.time()-MODIFY_WINDOW_MINUTES*60))
+        if not ids: return 0
+        try:
+            roll_up_sales(orders)
+            order_archive.archive([o for o in orders if o['order_id'] in ids])
+            for oid in ids: log_order("order_delete", order_id=oid, archived=True)
+            orders[:]=[o for o in orders if o['order_id'] not in ids]; save_orders(orders)
+        except BaseException:
+            # re-read the orders (and rebuild the expiry heap from them) so the next sweep retries these
+            pending_orders.clear(); cache.invalidate(); raise
+        return len(ids)
 
 def cleanup_expired_orders():
-    orders=load_orders(); expired=[o for o in orders if is_expired(o['timestamp'])]
-    if not expired: print("No expired."); pause(); return
-    for o in expired:
-        path=os.path.join(RECEIPTS_DIR,o['receipt_file'])
-        if os.path.exists(path): os.remove(path)
-        for item in o['products']:
-            for p in inventory:
-                if p['name'].lower()==item['name'].lower(): p['quantity']+=item['quantity']
-    remaining=[o for o in orders if not is_expired(o['timestamp'])]; save_orders(remaining); save_data(); print(f"Cleaned {len(expired)} expired orders."); pause()
+    n=sweep_expired()
+    if not n: print("No expired."); pause(); return
+    print(f"Archived {n} expired orders."); pause()
+
+# ------------------ Sales reports ------------------
+def roll_up_sales(orders=None):
+    """Fold orders that can no longer be modified into the daily sales rollups.
+    Returns (rollups, orders not rolled up yet)."""
+    cutoff=datetime.fromtimestamp(time.time()-MODIFY_WINDOW_MINUTES*60).strftime(expiry.TS_FORMAT)
+    with storage.locked():
+        rollups=analytics.Rollups.load()
+        if orders is None: orders=iter_orders(since=rollups.through or None)
+        folded,open_orders=rollups.close(orders, cutoff)
+        if folded: rollups.save()
+    return rollups, open_orders
+
+def sales_report(start=None, end=None, categories=None):
+    """categories: product key -> category; taken from the loaded store if not given."""
+    rollups,open_orders=roll_up_sales()
+    if categories is None: categories={k:p.get('category','') for k,p in store.by_name.items()}
+    return analytics.build_report(rollups, open_orders, start, end, categories)
+
+def print_sales_report(rep, top=10):
+    if not rep['orders']: print("No sales in this period."); return
+    print(f"Period: {rep['from']} to {rep['to']}\nOrders: {rep['orders']} | Units: {rep['units']} | Revenue: ${rep['revenue']:.2f} "
+          f"(tax ${rep['tax']:.2f}, discounts ${rep['discount']:.2f}) | Average order: ${rep['average_order']:.2f}")
+    print(f"\n{'Top products':<20}{'Units':<8}{'Revenue':<10}")
+    for r in rep['products'][:top]: print(f"{r['name']:<20}{r['units']:<8}${r['revenue']:<10.2f}")
+    print(f"\n{'Category':<20}{'Units':<8}{'Revenue':<12}{'Share':<6}")
+    for r in rep['categories']: print(f"{r['category']:<20}{r['units']:<8}${r['revenue']:<11.2f}{r['share']}%")
+    print(f"\n{'User':<20}{'Orders':<8}{'Revenue':<10}")
+    for r in rep['users'][:top]: print(f"{r['user']:<20}{r['orders']:<8}${r['revenue']:<10.2f}")
+    print("\nSales by hour: " + ", ".join(f"{r['hour']}h ${r['revenue']:.2f}" for r in rep['hours']))
+
+def show_sales_report():
+    inventory_module.refresh()
+    dates=[]
+    for prompt in ("From date YYYY-MM-DD (blank = all): ", "To date YYYY-MM-DD (blank = today): "):
+        d=input(prompt).strip()
+        if d:
+            try: datetime.strptime(d, "%Y-%m-%d")
+            except ValueError: print("Invalid date."); pause(); return
+        dates.append(d or None)
+    rep=sales_report(*dates); print_sales_report(rep)
+    name=input("\nExport to file (.csv or .json, blank to skip): ").strip()
+    if name:
+        analytics.write_report(name, rep); print(f"✅ Report saved to {name}")
+    pause()
@@ -0,0 +1,140 @@
+# Cold tier of the orders. Orders that can no longer be modified are moved out of
+# the hot tier (orders.json / the orders table, which then only holds orders still
+# inside the edit window) into one gzip-compressed JSON Lines partition per day:
+#
+#   orders_archive/2025-11-03.jsonl.gz   the day's orders; each sweep appends one gzip member
+#   orders_archive/2025-11-03.idx.jsonl  {"id", "user", "at": offset of the order's member, "row": line in it}
+#   orders_archive/catalog.json          {day: {"count", "first", "last", "users", "bytes", "idx_bytes"}}
+#
+# first/last are the lowest and highest order numbers of the day; usernames are
+# lower-cased. A lookup by order ID or username reads the catalog, then only the
+# partitions that can match, and in them only the members holding matching
+# orders. A sweep appends the orders a day does not hold yet as one new member
+# and index lines, so its cost depends on the orders it adds, not on the size of
+# the day. bytes/idx_bytes are the file lengths after the last complete sweep:
+# anything past them (a sweep cut short by a crash) is ignored by readers and cut
+# off by the next sweep, which archives those orders again.
+import gzip, json, os, shutil, zlib
+import storage, journal
+
+ARCHIVE_DIR = "orders_archive"
+CATALOG = os.path.join(ARCHIVE_DIR, "catalog.json")
+CHUNK = 1 << 16
+
+_ids = {}   # day -> (idx_bytes, set of order IDs) for days this process has read or written
+
+def _number(oid):
+    tail = oid.rsplit("_", 1)[-1]
+    return int(tail) if tail.isdigit() else 0
+
+def _paths(day): return os.path.join(ARCHIVE_DIR, f"{day}.jsonl.gz"), os.path.join(ARCHIVE_DIR, f"{day}.idx.jsonl")
+
+def load_catalog():
+    if not os.path.exists(CATALOG): return {}
+    with open(CATALOG, "r", encoding="utf-8") as f: return json.load(f)
+
+def _read_index(day, entry):
+    with open(_paths(day)[1], "rb") as f: data = f.read(entry["idx_bytes"])
+    return [json.loads(line) for line in data.splitlines() if line.strip()]
+
+def _day_ids(day, entry):
+    cached = _ids.get(day)
+    if cached and cached[0] == entry["idx_bytes"]: return cached[1]
+    ids = {r["id"] for r in _read_index(day, entry)}
+    _ids[day] = (entry["idx_bytes"], ids)
+    return ids
+
+def _read_member(f, at):
+    """(orders, offset of the next member) for the gzip member starting at byte `at`."""
+    f.seek(at)
+    d, out, pos = zlib.decompressobj(31), [], at
+    while not d.eof:
+        chunk = f.read(CHUNK)
+        if not chunk: raise EOFError(f"Truncated archive member at byte {at}")
+        out.append(d.decompress(chunk)); pos += len(chunk)
+    return [json.loads(line) for line in b"".join(out).splitlines() if line.strip()], pos - len(d.unused_data)
+
+def _iter_partition(day, entry, members=None):
+    """Orders of a day, in the order they were archived; optionally only those in the
+    members starting at the given offsets."""
+    with open(_paths(day)[0], "rb") as f:
+        if members is not None:
+            for at in sorted(members): yield from _read_member(f, at)[0]
+            return
+        at = 0
+        while at < entry["bytes"]:
+            rows, at = _read_member(f, at)
+            yield from rows
+
+def _write_at(path, size, data):
+    """Cut `path` back to `size` bytes and append `data`."""
+    with open(path, "ab") as f:
+        f.truncate(size); f.write(data)
+        f.flush(); os.fsync(f.fileno())
+    return size + len(data)
+
+def _append(day, entry, rows):
+    path, idx_path = _paths(day)
+    at = entry["bytes"]
+    size = _write_at(path, at, gzip.compress("".join(json.dumps(o, ensure_ascii=False) + "\n" for o in rows).encode("utf-8")))
+    index = "".join(json.dumps({"id": o["order_id"], "user": o["username"].lower(), "at": at, "row": i}, ensure_ascii=False) + "\n"
+                    for i, o in enumerate(rows))
+    idx_size = _write_at(idx_path, entry["idx_bytes"], index.encode("utf-8"))
+    ids = _day_ids(day, entry) if entry["count"] else set()
+    ids.update(o["order_id"] for o in rows); _ids[day] = (idx_size, ids)
+    numbers = [_number(o["order_id"]) for o in rows] + ([entry["first"], entry["last"]] if entry["count"] else [])
+    return {"count": entry["count"] + len(rows), "first": min(numbers), "last": max(numbers),
+            "users": sorted(set(entry["users"]) | {o["username"].lower() for o in rows}), "bytes": size, "idx_bytes": idx_size}
+
+def archive(orders):
+    """Add orders to their day partitions; returns how many were not archived already."""
+    by_day = {}
+    for o in orders: by_day.setdefault(o["timestamp"][:10], []).append(o)
+    if not by_day: return 0
+    with storage.locked():
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        catalog, added = load_catalog(), 0
+        for day, new in sorted(by_day.items()):
+            entry = catalog.get(day) or {"count": 0, "first": 0, "last": 0, "users": [], "bytes": 0, "idx_bytes": 0}
+            have = set(_day_ids(day, entry)) if entry["count"] else set()
+            fresh = []
+            for o in new:
+                if o["order_id"] not in have: fresh.append(o); have.add(o["order_id"])
+            if not fresh: continue
+            catalog[day] = _append(day, entry, fresh); added += len(fresh)
+        if added: journal.write_lines(CATALOG, [catalog])
+    return added
+
+def find(order_id):
+    """An archived order by ID, or None."""
+    n = _number(order_id)
+    for day, entry in load_catalog().items():
+        if not entry["first"] <= n <= entry["last"]: continue
+        r = next((r for r in _read_index(day, entry) if r["id"] == order_id), None)
+        if r is not None:
+            with open(_paths(day)[0], "rb") as f: return _read_member(f, r["at"])[0][r["row"]]
+    return None
+
+def iter_orders(username=None, since=None, until=None):
+    """Archived orders, day by day (within a day in the order they were archived, which
+    follows their timestamps); optionally one user's, or those stamped between since and
+    until (timestamps, inclusive). Only partitions and members that can match are read."""
+    catalog, key = load_catalog(), username.lower() if username else None
+    for day in sorted(catalog):
+        if since and day < since[:10]: continue
+        if until and day > until[:10]: break
+        entry = catalog[day]
+        if key and key not in entry["users"]: continue
+        members = {r["at"] for r in _read_index(day, entry) if r["user"] == key} if key else None
+        for o in _iter_partition(day, entry, members):
+            if key and o["username"].lower() != key: continue
+            if (since and o["timestamp"] < since) or (until and o["timestamp"] > until): continue
+            yield o
+
+def last_number():
+    """Highest archived order number (0 if none)."""
+    return max((e["last"] for e in load_catalog().values()), default=0)
+
+def erase():
+    _ids.clear()
+    if os.path.exists(ARCHIVE_DIR): shutil.rmtree(ARCHIVE_DIR)
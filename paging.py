@@ -0,0 +1,62 @@
+# Paged listings for the inventory and order views. Only the rows of the pages
+# actually shown are pulled from the source iterator and rendered; a sorted view
+# keeps just the first pages' worth of rows in a heap instead of sorting all.
+import heapq, os
+from itertools import islice
+
+PAGE_SIZE = int(os.environ.get("HAMI_PAGE_SIZE", "20"))
+
+class Pager:
+    """Pages over the rows of source(), a callable returning a fresh iterator."""
+    def __init__(self, source, size=PAGE_SIZE, key=None, reverse=False):
+        self.source, self.size, self.key, self.reverse = source, max(1, size), key, reverse
+        self.rows, self.done, self.it = [], False, None
+
+    def _fill(self, n):
+        if len(self.rows) >= n or self.done: return
+        if self.key is None:
+            # unsorted: keep reading the same iterator where the last page stopped
+            if self.it is None: self.it = iter(self.source())
+            self.rows += islice(self.it, n - len(self.rows))
+            self.done = len(self.rows) < n
+        else:
+            want = max(n, 2 * len(self.rows))
+            self.rows = (heapq.nlargest if self.reverse else heapq.nsmallest)(want, self.source(), key=self.key)
+            self.done = len(self.rows) < want
+
+    def page(self, number):
+        """(rows, more) for 1-based page `number`."""
+        start = (number - 1) * self.size
+        self._fill(start + self.size + 1)
+        return self.rows[start:start + self.size], len(self.rows) > start + self.size
+
+def parse_options(text, sorts, filters):
+    """Parse e.g. '-quantity category=Fruit' into (sort key, descending, {filter: value}).
+    Raises ValueError naming the unknown word."""
+    sort, reverse, chosen = None, False, {}
+    for word in text.split():
+        if "=" in word:
+            name, value = word.split("=", 1)
+            if name.lower() not in filters: raise ValueError(name)
+            chosen[name.lower()] = value
+        else:
+            reverse, name = word.startswith("-"), word.lstrip("-").lower()
+            if name not in sorts: raise ValueError(word)
+            sort = name
+    return sort, reverse, chosen
+
+def browse(pager, show):
+    """Show page after page; show(rows, first_row_number) prints one page.
+    Returns the number of rows shown (0 if there were none)."""
+    number, shown = 1, 0
+    while True:
+        rows, more = pager.page(number)
+        if not rows: return shown
+        show(rows, (number - 1) * pager.size + 1)
+        shown = max(shown, (number - 1) * pager.size + len(rows))
+        if not more and number == 1: return shown
+        nav = ("Enter = next, " if more else "Enter = done, ") + ("'p' = previous, " if number > 1 else "") + "'q' = stop"
+        ch = input(f"Page {number} ({nav}): ").strip().lower()
+        if ch == "p" and number > 1: number -= 1
+        elif ch == "q" or not more: return shown
+        else: number += 1
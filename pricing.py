@@ -0,0 +1,63 @@
+# One pricing engine for every order total. All arithmetic is done in integer
+# cents with half-up rounding, so totals never drift; whole batches of orders
+# (e.g. the full history after a tax change) are priced at once, vectorized
+# with NumPy when it is installed and with plain integer loops otherwise.
+from decimal import Decimal, ROUND_HALF_UP
+from fractions import Fraction
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TAX_RATE = 0.05
+DISCOUNT_THRESHOLD = 20.0
+DISCOUNT_RATE = 0.10
+
+def to_cents(amount): return int((Decimal(str(amount)) * 100).quantize(Decimal(1), ROUND_HALF_UP))
+
+def to_amount(cents): return cents / 100
+
+def _rate(rate):
+    f = Fraction(str(rate))
+    return f.numerator, f.denominator
+
+def line_total(item): return to_amount(to_cents(item['price']) * int(item['quantity']))
+
+def price_orders(carts, discounts=None, tax_rate=None, discount_rate=None, threshold=None):
+    """Price many carts in one pass. `discounts` is one opt-in flag per cart (default none).
+    Returns a list of (subtotal, tax, discount, total) in dollars."""
+    tax_rate = TAX_RATE if tax_rate is None else tax_rate
+    discount_rate = DISCOUNT_RATE if discount_rate is None else discount_rate
+    threshold = to_cents(DISCOUNT_THRESHOLD if threshold is None else threshold)
+    discounts = [False] * len(carts) if discounts is None else discounts
+    tn, td = _rate(tax_rate); dn, dd = _rate(discount_rate)
+    if np is not None and carts:
+        idx = np.fromiter((n for n, cart in enumerate(carts) for _ in cart), dtype=np.int64)
+        price = np.fromiter((to_cents(i['price']) for cart in carts for i in cart), dtype=np.int64, count=len(idx))
+        qty = np.fromiter((int(i['quantity']) for cart in carts for i in cart), dtype=np.int64, count=len(idx))
+        sub = np.zeros(len(carts), dtype=np.int64)
+        np.add.at(sub, idx, price * qty)
+        tax = (2 * sub * tn + td) // (2 * td)
+        eligible = np.asarray(discounts, dtype=bool) & (sub > threshold)
+        disc = np.where(eligible, (2 * sub * dn + dd) // (2 * dd), 0)
+        rows = zip(sub.tolist(), tax.tolist(), disc.tolist())
+    else:
+        rows = []
+        for cart, opt_in in zip(carts, discounts):
+            sub = sum(to_cents(i['price']) * int(i['quantity']) for i in cart)
+            disc = (2 * sub * dn + dd) // (2 * dd) if opt_in and sub > threshold else 0
+            rows.append((sub, (2 * sub * tn + td) // (2 * td), disc))
+    return [(to_amount(s), to_amount(t), to_amount(d), to_amount(s + t - d)) for s, t, d in rows]
+
+def price_cart(cart, apply_discount=False):
+    return price_orders([cart], [apply_discount])[0]
+
+def discount_opted_in(order): return order.get('discount_opt_in', order.get('discount', 0) > 0)
+
+def reprice_orders(orders, **rates):
+    """Recompute subtotal/tax/discount/total of stored orders in place, e.g. after a tax change.
+    Each order keeps its own discount choice."""
+    totals = price_orders([o['products'] for o in orders], [discount_opted_in(o) for o in orders], **rates)
+    for o, (subtotal, tax, disc, total) in zip(orders, totals):
+        o['subtotal'], o['tax'], o['discount'], o['total'] = subtotal, tax, disc, total
+    return orders
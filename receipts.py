@@ -0,0 +1,129 @@
+# Receipt rendering and storage: receipts are queued
+# to a small pool of writer threads (bounded queue, flushed at exit); a checkout
+# waits only for its own receipts before it completes (wait()). With
+# HAMI_RECEIPTS=archive they go into one compressed zip per day instead of one
+# small text file per order.
+import atexit, os, queue, re, threading, warnings, zipfile
+import pricing
+
+RECEIPTS_DIR = "receipts"
+MODE = os.environ.get("HAMI_RECEIPTS", "files")
+WORKERS = int(os.environ.get("HAMI_RECEIPT_WORKERS", "1"))
+QUEUE_SIZE = 1000
+
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_workers = []
+_archive_lock = threading.Lock()
+_errors = []
+_submitted = set()
+_queued = {}   # receipt name -> copies still waiting for a writer
+_done = threading.Condition()
+
+def render(order):
+    lines = ["Hami MiniMarket - Receipt",
+             f"Order ID: {order['order_id']}", f"User: {order['username']}", f"Timestamp: {order['timestamp']}", "",
+             f"{'Name':<15}{'Qty':<6}{'Price':<10}{'Line':<12}", "-"*50]
+    for i in order["products"]:
+        lines.append(f"{i['name']:<15}{i['quantity']:<6}{i['price']:<10.2f}{pricing.line_total(i):<12.2f}")
+    lines += ["-"*50, f"Subtotal: ${order['subtotal']:.2f}", f"Tax: ${order['tax']:.2f}",
+              f"Discount: ${order['discount']:.2f}", f"Total: ${order['total']:.2f}"]
+    return "\n".join(lines) + "\n"
+
+def archive_path(name):
+    m = re.search(r"(\d{4}-\d{2}-\d{2})_\d{2}-\d{2}-\d{2}", name)
+    return os.path.join(RECEIPTS_DIR, f"receipts_{m.group(1) if m else 'undated'}.zip")
+
+def location(name):
+    """Where a receipt ends up, for messages."""
+    return f"{archive_path(name)}:{name}" if MODE == "archive" else os.path.join(RECEIPTS_DIR, name)
+
+def _store(name, text):
+    os.makedirs(RECEIPTS_DIR, exist_ok=True)
+    if MODE == "archive":
+        with _archive_lock, warnings.catch_warnings(), zipfile.ZipFile(archive_path(name), "a", zipfile.ZIP_DEFLATED) as z:
+            warnings.simplefilter("ignore")  # a rewritten receipt is appended; reads take the newest copy
+            z.writestr(name, text)
+    else:
+        with open(os.path.join(RECEIPTS_DIR, name), "w", encoding="utf-8") as f: f.write(text)
+
+def _work():
+    while True:
+        order = _queue.get()
+        name = order["receipt_file"]
+        try: _store(name, render(order))
+        except Exception as e: _errors.append((name, e))
+        finally:
+            with _done:
+                _queued[name] -= 1
+                if not _queued[name]: del _queued[name]
+                _done.notify_all()
+            _queue.task_done()
+
+def exists(name):
+    """Whether a receipt of that name has been submitted here or is on disk (from any till)."""
+    if name in _submitted: return True
+    if MODE != "archive": return os.path.exists(os.path.join(RECEIPTS_DIR, name))
+    path = archive_path(name)
+    if not os.path.exists(path): return False
+    with _archive_lock, zipfile.ZipFile(path) as z: return name in z.namelist()
+
+def submit(order):
+    """Queue a receipt for writing and return where it will be stored. Blocks only if the
+    queue is full. With HAMI_RECEIPT_WORKERS=0 the receipt is written immediately."""
+    _submitted.add(order["receipt_file"])
+    if WORKERS <= 0:
+        _store(order["receipt_file"], render(order))
+        return location(order["receipt_file"])
+    if not _workers:
+        for _ in range(WORKERS):
+            t = threading.Thread(target=_work, daemon=True); t.start(); _workers.append(t)
+    with _done: _queued[order["receipt_file"]] = _queued.get(order["receipt_file"], 0) + 1
+    _queue.put(dict(order, products=[dict(i) for i in order["products"]]))
+    return location(order["receipt_file"])
+
+def wait(names):
+    """Wait until these receipts are on disk; raises the error if one could not be written."""
+    names = set(names)
+    with _done: _done.wait_for(lambda: not names & _queued.keys())
+    failed = [(n, e) for n, e in _errors if n in names]
+    if failed:
+        _errors[:] = [(n, e) for n, e in _errors if n not in names]
+        raise failed[0][1]
+
+def flush():
+    """Wait until every queued receipt is on disk."""
+    _queue.join()
+    for name, e in _errors: print(f"⚠️ Could not write receipt {name}: {e}")
+    _errors.clear()
+
+atexit.register(flush)
+
+def read(name):
+    flush()
+    if MODE == "archive":
+        path = archive_path(name)
+        if not os.path.exists(path): return None
+        with _archive_lock, zipfile.ZipFile(path) as z:
+            return z.read(name).decode("utf-8") if name in z.namelist() else None
+    path = os.path.join(RECEIPTS_DIR, name)
+    if not os.path.exists(path): return None
+    with open(path, "r", encoding="utf-8") as f: return f.read()
+
+def remove(names):
+    """Delete receipts (pending writes are flushed first so nothing reappears)."""
+    flush()
+    by_archive = {}
+    for name in names:
+        path = os.path.join(RECEIPTS_DIR, name)
+        if os.path.exists(path): os.remove(path)
+        by_archive.setdefault(archive_path(name), set()).add(name)
+    with _archive_lock:
+        for path, drop in by_archive.items():
+            if not os.path.exists(path): continue
+            with zipfile.ZipFile(path) as z:
+                if not drop & set(z.namelist()): continue
+                keep = {i.filename: z.read(i) for i in z.infolist() if i.filename not in drop}
+            if not keep: os.remove(path); continue
+            with zipfile.ZipFile(path + ".tmp", "w", zipfile.ZIP_DEFLATED) as z:
+                for n, data in keep.items(): z.writestr(n, data)
+            os.replace(path + ".tmp", path)
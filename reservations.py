@@ -0,0 +1,53 @@
+# Time-limited stock holds so several tills can fill carts against the same store.
+# Holds live in a small shared file and are only touched under storage.locked().
+import os, time, uuid
+import storage
+import inventory
+
+HOLDS_FILE = "holds.json"
+HOLD_SECONDS = int(os.environ.get("HAMI_HOLD_SECONDS", "900"))
+
+class HoldError(Exception): pass
+
+def new_owner(username): return f"{username}:{uuid.uuid4().hex[:8]}"
+
+def _load():
+    """Active holds; expired ones are dropped (and the file rewritten) on every read."""
+    holds = storage.read_json(HOLDS_FILE)
+    now = time.time()
+    active = [h for h in holds if h["expires"] > now]
+    if len(active) != len(holds): storage.write_json(HOLDS_FILE, active)
+    return active
+
+def held(exclude=None):
+    """Quantity on hold per product key, optionally ignoring one owner's holds."""
+    with storage.locked():
+        totals = {}
+        for h in _load():
+            if h["owner"] != exclude: totals[h["key"]] = totals.get(h["key"], 0) + h["quantity"]
+        return totals
+
+def available(product, owner=None):
+    return product["quantity"] - held(exclude=owner).get(storage.name_key(product["name"]), 0)
+
+def place(owner, name, qty):
+    """Hold qty of a product for owner; raises HoldError if the free stock is too low."""
+    with storage.locked():
+        inventory.refresh()
+        p = inventory.store.get(name)
+        if not p: raise HoldError("Not found.")
+        holds = _load()
+        key = storage.name_key(p["name"])
+        taken = sum(h["quantity"] for h in holds if h["key"] == key)
+        if qty > p["quantity"] - taken: raise HoldError("Not enough stock.")
+        expires = time.time() + HOLD_SECONDS
+        for h in holds:
+            if h["owner"] == owner: h["expires"] = expires  # adding to a cart keeps it alive
+        holds.append({"owner": owner, "key": key, "quantity": qty, "expires": expires})
+        storage.write_json(HOLDS_FILE, holds)
+
+def release(owner):
+    with storage.locked():
+        holds = _load()
+        keep = [h for h in holds if h["owner"] != owner]
+        if len(keep) != len(holds): storage.write_json(HOLDS_FILE, keep)
@@ -0,0 +1,140 @@
+# Product search index: trigram postings over name and category for substring
+# and typo-tolerant matching, plus word postings and a sorted list of the
+# distinct words for prefix matching. New words are appended and the list is
+# sorted once before the next prefix lookup, so building the index is one sort
+# rather than one list insert per word. Kept up to date incrementally by
+# inventory.InventoryStore, and across reloads by sync().
+from bisect import bisect_left
+
+def fold(text): return text.strip().casefold()
+
+def trigrams(text, pad=True):
+    """Trigrams of text; padding adds word-boundary grams used for indexing and fuzzy scoring."""
+    if pad: text = f"  {text} "
+    return {text[i:i+3] for i in range(len(text) - 2)}
+
+def edit_distance(a, b, limit):
+    """Edit distance counting a swap of neighbouring letters as one typo,
+    or limit+1 as soon as it must exceed `limit`."""
+    if abs(len(a) - len(b)) > limit: return limit + 1
+    before, prev = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            d = min(prev[j] + 1, cur[j-1] + 1, prev[j-1] + (ca != cb))
+            if before and i > 1 and j > 1 and ca == b[j-2] and a[i-2] == cb: d = min(d, before[j-2] + 1)
+            cur.append(d)
+        if min(cur) > limit: return limit + 1
+        before, prev = prev, cur
+    return prev[-1]
+
+class SearchIndex:
+    def __init__(self):
+        self.docs = {}       # key -> (folded name, folded category)
+        self.grams = {}      # trigram -> set of keys
+        self.postings = {}   # word -> set of keys
+        self.words = []      # distinct words, sorted unless `unsorted`
+        self.unsorted = False
+
+    def add(self, product):
+        name, cat = fold(product["name"]), fold(product.get("category", ""))
+        key = name
+        self.docs[key] = (name, cat)
+        grams = self.grams
+        for g in trigrams(name) | trigrams(cat):
+            keys = grams.get(g)
+            if keys is None: grams[g] = {key}
+            else: keys.add(key)
+        for w in set(name.split()) | set(cat.split()):
+            keys = self.postings.get(w)
+            if keys is None:
+                keys = self.postings[w] = set(); self.words.append(w); self.unsorted = True
+            keys.add(key)
+
+    def sync(self, products):
+        """Bring the index in line with `products` (e.g. after a reload), re-indexing only
+        the products that are new or whose name or category changed."""
+        want = {fold(p["name"]): p for p in products}
+        for k in [k for k, doc in self.docs.items() if k not in want or doc[1] != fold(want[k].get("category", ""))]:
+            self.remove({"name": k})
+        for k, p in want.items():
+            if k not in self.docs: self.add(p)
+
+    def _sorted_words(self):
+        if self.unsorted: self.words.sort(); self.unsorted = False
+        return self.words
+
+    def remove(self, product):
+        key = fold(product["name"])
+        doc = self.docs.pop(key, None)
+        if doc is None: return
+        name, cat = doc
+        for g in trigrams(name) | trigrams(cat):
+            s = self.grams.get(g)
+            if s is not None:
+                s.discard(key)
+                if not s: del self.grams[g]
+        for w in set(name.split()) | set(cat.split()):
+            keys = self.postings.get(w)
+            if keys is None: continue
+            keys.discard(key)
+            if not keys:
+                del self.postings[w]
+                words = self._sorted_words(); del words[bisect_left(words, w)]
+
+    def _prefix(self, term):
+        out, words = set(), self._sorted_words()
+        i = bisect_left(words, term)
+        while i < len(words) and words[i].startswith(term):
+            out |= self.postings[words[i]]; i += 1
+        return out
+
+    def _substring(self, term):
+        grams = sorted((self.grams.get(g, set()) for g in trigrams(term, pad=False)), key=len)
+        if not grams: return set()
+        cands = set(grams[0])
+        for s in grams[1:]:
+            cands &= s
+            if not cands: break
+        return {k for k in cands if term in self.docs[k][0] or term in self.docs[k][1]}
+
+    def _fuzzy(self, term, exclude):
+        limit = 1 if len(term) < 7 else 2
+        common = max(1000, len(self.docs) // 10)  # grams shared by most products say nothing
+        counts = {}
+        for g in trigrams(term):
+            posting = self.grams.get(g, ())
+            if len(posting) > common: continue
+            for k in posting:
+                if k not in exclude: counts[k] = counts.get(k, 0) + 1
+        need = max(1, len(trigrams(term)) - 4 * limit)  # one typo touches up to four grams
+        out = {}
+        for k, c in counts.items():
+            if c < need: continue
+            name, cat = self.docs[k]
+            d = min([edit_distance(term, w, limit) for w in name.split() + cat.split()] + [edit_distance(term, name, limit)])
+            if d <= limit: out[k] = d
+        return out
+
+    def search(self, term, page=1, page_size=20):
+        """Ranked keys for `term` and the total match count. Rank: exact name, name prefix,
+        word prefix, substring of name, category match, then typo matches by distance.
+        Terms shorter than three letters only match at the start of a word."""
+        term = fold(term)
+        if not term: return [], 0
+        hits = self._prefix(term)
+        if len(term) >= 3: hits |= self._substring(term)
+        ranked = []
+        for k in hits:
+            name, cat = self.docs[k]
+            if name == term: r = 0
+            elif name.startswith(term): r = 1
+            elif any(w.startswith(term) for w in name.split()): r = 2
+            elif term in name: r = 3
+            else: r = 4
+            ranked.append((r, name, k))
+        if len(term) >= 3 and len(ranked) < page * page_size:  # typo matches only fill short pages
+            ranked += [(5 + d, self.docs[k][0], k) for k, d in self._fuzzy(term, hits).items()]
+        ranked.sort()
+        start = (page - 1) * page_size
+        return [k for _, _, k in ranked[start:start + page_size]], len(ranked)
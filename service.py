@@ -0,0 +1,233 @@
+# Local HTTP/JSON service over the inventory and orders, so several tills and a
+# dashboard can share one process instead of each re-reading the data files.
+#
+#   python main.py serve --host 127.0.0.1 --port 8080
+#
+# The inventory stays loaded in memory. Every write (product changes, checkout,
+# order edits, cleanup) goes through one writer task and runs, one at a time, on
+# a worker thread; reads of the in-memory store are answered on the event loop
+# between writes, and order listings (read from the files) run concurrently in
+# the default thread pool.
+#
+#   GET    /products?page=&size=&sort=-quantity&category=    GET /products/search?q=&page=&size=
+#   GET    /products/<name>      POST /products {name, category, price, quantity}
+#   PATCH  /products/<name> {fields to change}                DELETE /products/<name>
+#   GET    /low-stock            POST /checkout {username, items: [{name, quantity}], discount}
+#   GET    /orders?page=&size=&sort=&user=&from=&to=&archived=1  GET /orders/<id>
+#   PATCH  /orders/<id> {name, quantity}                      DELETE /orders/<id>
+#   POST   /cleanup              GET /report?from=&to=
+#   POST   /undo                 POST /redo
+import asyncio, json, re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qsl, unquote
+import inventory, order, batch_orders, storage
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 500: "Internal Server Error"}
+MAX_BODY = 1 << 20
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message); self.status = status
+
+def _int(params, name, default):
+    try: return max(1, int(params.get(name, default)))
+    except ValueError: raise HTTPError(400, f"{name} must be a number")
+
+def _sort(params, sorts):
+    sort = params.get("sort", "")
+    if sort.lstrip("-") and sort.lstrip("-") not in sorts: raise HTTPError(400, f"Unknown sort: {sort}")
+    return sort.lstrip("-") or None, sort.startswith("-")
+
+def _product(name):
+    p = inventory.store.get(name)
+    if not p: raise HTTPError(404, "Not found.")
+    return p
+
+# ------------------ Handlers ------------------
+# Each returns (status, payload). "mem" handlers read the in-memory store, "disk"
+# handlers read files only, "write" handlers change data and are serialized.
+def list_products(params, body):
+    sort, reverse = _sort(params, inventory.PRODUCT_SORTS)
+    page, size = _int(params, "page", 1), _int(params, "size", 20)
+    rows, more = inventory.product_pager(sort, reverse, params.get("category"), size).page(page)
+    return 200, {"page": page, "size": size, "more": more, "total": len(inventory.store), "products": [dict(p) for p in rows]}
+
+def search_products(params, body):
+    page, size = _int(params, "page", 1), _int(params, "size", 20)
+    found, total = inventory.store.search(params.get("q", ""), page, size)
+    return 200, {"page": page, "size": size, "total": total, "products": [dict(p) for p in found]}
+
+def get_product(params, body, name):
+    p = _product(name)
+    return 200, dict(p, status=inventory.stock_status(p["quantity"], p))
+
+def low_stock(params, body):
+    return 200, {"products": [dict(p) for p in sorted(inventory.store.low_stock.products(), key=lambda p: p["quantity"])]}
+
+def add_product(params, body):
+    return 201, dict(inventory.create_product(body.get("name", ""), body.get("category", ""), body.get("price"), body.get("quantity")))
+
+def update_product(params, body, name): return 200, dict(inventory.edit_product(name, body))
+
+def delete_product(params, body, name): return 200, dict(inventory.remove_product(name))
+
+def checkout(params, body):
+    if not str(body.get("username", "")).strip(): raise HTTPError(400, "username is required")
+    if not body.get("items"): raise HTTPError(400, "items is required")
+    order.sweep_expired()  # as the menu does before an order is made or changed
+    tx = order.CheckoutTransaction()
+    placed = tx.add(body["username"], batch_orders.build_cart(body.get("items", [])), bool(body.get("discount")))
+    tx.commit()
+    return 201, placed
+
+def list_orders(params, body):
+    sort, reverse = _sort(params, order.ORDER_SORTS)
+    page, size = _int(params, "page", 1), _int(params, "size", 20)
+    rows, more = order.order_pager(sort, reverse, params.get("user"), params.get("from"), params.get("to"), size,
+                                   params.get("archived", "") in ("1", "true", "yes")).page(page)
+    return 200, {"page": page, "size": size, "more": more, "orders": rows}
+
+def get_order(params, body, oid):
+    o = storage.backend.get_order(order.ORDERS_FILE, oid) or order.order_archive.find(oid)
+    if not o: raise HTTPError(404, "Not found.")
+    return 200, o
+
+def modify_order(params, body, oid):
+    try: qty = inventory.whole_number(body.get("quantity"))
+    except (TypeError, ValueError): raise HTTPError(400, "quantity must be a whole number")
+    order.sweep_expired()
+    return 200, order.change_order_item(oid, str(body.get("name", "")), qty)
+
+def delete_order(params, body, oid): order.sweep_expired(); order.cancel_order(oid); return 200, {"deleted": oid}
+
+def cleanup(params, body): return 200, {"archived": order.sweep_expired()}
+
+def _replay(fn, what):
+    label = fn()
+    if label is None: raise HTTPError(409, f"Nothing to {what}.")
+    return 200, {"label": label}
+
+def undo(params, body): return _replay(inventory.undo_change, "undo")
+
+def redo(params, body): return _replay(inventory.redo_change, "redo")
+
+def report(params, body):
+    # runs beside the writer thread, so categories come from the saved inventory, not the live store
+    rows = storage.backend.load_inventory(inventory.INVENTORY_FILE)
+    return 200, order.sales_report(params.get("from"), params.get("to"), {storage.name_key(p["name"]): p.get("category", "") for p in rows})
+
+ROUTES = [
+    ("GET", r"/products", list_products, "mem"), ("GET", r"/products/search", search_products, "mem"),
+    ("GET", r"/low-stock", low_stock, "mem"), ("GET", r"/products/([^/]+)", get_product, "mem"),
+    ("POST", r"/products", add_product, "write"), ("PATCH", r"/products/([^/]+)", update_product, "write"),
+    ("DELETE", r"/products/([^/]+)", delete_product, "write"), ("POST", r"/checkout", checkout, "write"),
+    ("GET", r"/orders", list_orders, "disk"), ("GET", r"/orders/([^/]+)", get_order, "disk"),
+    ("PATCH", r"/orders/([^/]+)", modify_order, "write"), ("DELETE", r"/orders/([^/]+)", delete_order, "write"),
+    ("POST", r"/cleanup", cleanup, "write"), ("GET", r"/report", report, "disk"),
+    ("POST", r"/undo", undo, "write"), ("POST", r"/redo", redo, "write"),
+]
+ROUTES = [(m, re.compile(p + r"/?$"), fn, kind) for m, p, fn, kind in ROUTES]
+
+# ------------------ Server ------------------
+class Service:
+    def __init__(self):
+        self.writes = None
+        self.idle = None
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hami-writer")
+
+    async def writer(self):
+        """The single writer: runs queued write operations one after another."""
+        loop = asyncio.get_running_loop()
+        while True:
+            fn, args, done = await self.writes.get()
+            await asyncio.sleep(0)  # let reads woken by the previous write run first
+            self.idle.clear()
+            try: result = await loop.run_in_executor(self.pool, lambda: fn(*args))
+            except BaseException as e:
+                if not done.cancelled(): done.set_exception(e)
+            else:
+                if not done.cancelled(): done.set_result(result)
+            finally:
+                self.idle.set()
+
+    async def run(self, kind, fn, args):
+        if kind == "write":
+            done = asyncio.get_running_loop().create_future()
+            await self.writes.put((fn, args, done))
+            return await done
+        if kind == "disk": return await asyncio.get_running_loop().run_in_executor(None, lambda: fn(*args))
+        await self.idle.wait()  # never read the store halfway through a write
+        return fn(*args)
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query))
+        allowed = False
+        for m, pattern, fn, kind in ROUTES:
+            match = pattern.match(url.path)
+            if not match: continue
+            if m != method: allowed = True; continue
+            try: data = json.loads(body) if body else {}
+            except ValueError: return 400, {"error": "Body must be JSON"}
+            if not isinstance(data, dict): return 400, {"error": "Body must be a JSON object"}
+            try:
+                return await self.run(kind, fn, (params, data) + tuple(unquote(g) for g in match.groups()))
+            except HTTPError as e: return e.status, {"error": str(e)}
+            except (inventory.ProductInputError, order.CheckoutInputError) as e: return 400, {"error": str(e)}
+            except inventory.ProductError as e: return (404 if str(e) == "Not found." else 409), {"error": str(e)}
+            except order.CheckoutError as e: return (404 if str(e) == "Not found." else 409), {"error": str(e)}
+        return (405, {"error": "Method not allowed"}) if allowed else (404, {"error": "No such endpoint"})
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip(): break
+                method, target, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""): break
+                    k, _, v = h.decode("latin-1").partition(":"); headers[k.strip().lower()] = v.strip()
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY: status, payload = 400, {"error": "Body too large"}
+                else:
+                    body = await reader.readexactly(length)
+                    try: status, payload = await self.dispatch(method.upper(), target, body)
+                    except Exception as e: status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                keep = headers.get("connection", "").lower() != "close" and length <= MAX_BODY
+                writer.write(f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\nConnection: {'keep-alive' if keep else 'close'}\r\n\r\n".encode("latin-1") + data)
+                await writer.drain()
+                if not keep: break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8080, ready=None):
+        self.writes, self.idle = asyncio.Queue(), asyncio.Event()
+        self.idle.set()
+        inventory.load_data()
+        tasks = [asyncio.create_task(self.writer())]
+        if order.SWEEP_SECONDS: tasks.append(asyncio.create_task(self.sweeper(order.SWEEP_SECONDS)))
+        server = await asyncio.start_server(self.handle, host, port)
+        if ready: ready(server)
+        try:
+            async with server: await server.serve_forever()
+        finally:
+            for t in tasks: t.cancel()
+            self.pool.shutdown(wait=True)
+
+    async def sweeper(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try: await self.run("write", order.sweep_expired, ())
+            except Exception as e: print(f"⚠️ Expiry sweep failed: {e}")
+
+def serve(host="127.0.0.1", port=8080):
+    print(f"Serving on http://{host}:{port} (Ctrl+C to stop)")
+    try: asyncio.run(Service().serve(host, port))
+    except KeyboardInterrupt: pass
@@ -0,0 +1,88 @@
+# Low-stock thresholds, a low-stock set that is kept current on every quantity
+# change, and reorder suggestions based on sales velocity from order history.
+#
+# thresholds.json (optional):
+#   {"default": {"low": 20, "good": 100},
+#    "categories": {"Dairy": {"low": 50}},
+#    "products": {"Milk": {"low": 80, "good": 300}}}
+import csv, math, os, time
+import storage
+from expiry import parse_ts
+
+THRESHOLDS_FILE = "thresholds.json"
+DEFAULT_LOW, DEFAULT_GOOD = 20, 100
+
+class Thresholds:
+    def __init__(self, data=None):
+        data = data or {}
+        self.default = {"low": DEFAULT_LOW, "good": DEFAULT_GOOD, **data.get("default", {})}
+        self.categories = {storage.name_key(k): v for k, v in data.get("categories", {}).items()}
+        self.products = {storage.name_key(k): v for k, v in data.get("products", {}).items()}
+
+    @classmethod
+    def load(cls, path=THRESHOLDS_FILE): return cls(storage.read_json(path) if os.path.exists(path) else None)
+
+    def for_product(self, product):
+        """(low, good): product setting over category setting over the default."""
+        t = dict(self.default)
+        t.update(self.categories.get(storage.name_key(product.get("category", "")), {}))
+        t.update(self.products.get(storage.name_key(product["name"]), {}))
+        return t["low"], t["good"]
+
+thresholds = Thresholds.load()
+
+class LowStockTracker:
+    """Names of products currently below their low threshold, updated per change."""
+    def __init__(self):
+        self.low = {}   # key -> product
+
+    def clear(self): self.low.clear()
+
+    def update(self, product):
+        k = storage.name_key(product["name"])
+        if product["quantity"] < thresholds.for_product(product)[0]: self.low[k] = product
+        else: self.low.pop(k, None)
+
+    def discard(self, product): self.low.pop(storage.name_key(product["name"]), None)
+
+    def products(self): return list(self.low.values())
+
+    def __len__(self): return len(self.low)
+
+# ------------------ Reorder suggestions ------------------
+def sales_velocity(orders, days=30, now=None):
+    """Units sold per day per product key over the last `days` days, streaming over orders."""
+    now = time.time() if now is None else now
+    since = now - days * 86400
+    sold = {}
+    for o in orders:
+        if parse_ts(o["timestamp"]) < since: continue
+        for item in o["products"]:
+            k = storage.name_key(item["name"])
+            sold[k] = sold.get(k, 0) + item["quantity"]
+    return {k: q / days for k, q in sold.items()}
+
+def reorder_suggestions(products, orders, days=30, lead_time=3, cover=14, now=None):
+    """Suggest quantities so each product covers lead_time+cover days of sales and
+    stays above its low threshold. Most urgent (fewest days of stock left) first."""
+    velocity = sales_velocity(orders, days, now)
+    out = []
+    for p in products:
+        v = velocity.get(storage.name_key(p["name"]), 0.0)
+        low, _ = thresholds.for_product(p)
+        target = v * (lead_time + cover) + low
+        qty = math.ceil(target - p["quantity"])
+        if qty <= 0: continue
+        days_left = p["quantity"] / v if v else None
+        out.append({"name": p["name"], "category": p.get("category", ""), "quantity": p["quantity"],
+                    "per_day": round(v, 2), "days_left": None if days_left is None else round(days_left, 1),
+                    "suggested": qty})
+    out.sort(key=lambda r: (r["days_left"] is None, r["days_left"] or 0, r["name"]))
+    return out
+
+def write_suggestions(path, rows):
+    if path.lower().endswith(".json"):
+        storage.write_json(path, rows); return
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=["name", "category", "quantity", "per_day", "days_left", "suggested"])
+        w.writeheader(); w.writerows(rows)
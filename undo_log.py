@@ -0,0 +1,133 @@
+# Multi-level undo/redo history of inventory changes. Each entry is a list of
+# compact changes (only the fields that changed for updates, deltas for stock),
+# so manual edits and the stock moves made by checkouts, order edits and order
+# cancellations can all be undone and redone; entries for the latter also hold
+# the order before and after, so the order is undone with its stock. The history is bounded by entry count
+# and by approximate size (oldest entries are dropped first; the newest is kept even
+# if it alone is over the size limit, e.g. a bulk import) and persisted as an
+# append-only log (undo.log) that is rewritten when it grows, so it survives a
+# restart.
+#
+# Change records:
+#   {"op": "add"|"delete", "product": {...}}
+#   {"op": "update", "name": <name after the change>, "diff": {field: [old, new]}}
+#   {"op": "stock", "name": <name>, "delta": <int>}
+#   {"op": "order", "before": <order or None>, "after": <order or None>}   (see order.py)
+import json, os
+from collections import deque
+from contextlib import contextmanager
+import storage
+
+HISTORY_FILE = "undo.log"
+DEPTH = int(os.environ.get("HAMI_UNDO_DEPTH", "200"))
+MAX_BYTES = int(os.environ.get("HAMI_UNDO_BYTES", str(1 << 20)))
+
+def _size(entry): return len(json.dumps(entry, ensure_ascii=False))
+
+class History:
+    def __init__(self, path=HISTORY_FILE, depth=DEPTH, max_bytes=MAX_BYTES):
+        self.path, self.depth, self.max_bytes = path, depth, max_bytes
+        self.undo_stack = deque()   # oldest first; entries are {"label", "changes"}
+        self.redo_stack = []        # next redo last
+        self.bytes = 0
+        self.loaded = False
+        self.version = None
+        self.log_lines = 0
+        self._group = None
+        self._paused = 0
+
+    # --- in-memory stacks ---
+    def _push(self, entry):
+        self.undo_stack.append(entry); self.bytes += _size(entry)
+        while len(self.undo_stack) > 1 and (len(self.undo_stack) > self.depth or self.bytes > self.max_bytes):
+            self.bytes -= _size(self.undo_stack.popleft())
+
+    def _apply_line(self, rec):
+        if "do" in rec: self._push(rec["do"]); self.redo_stack.clear()
+        elif rec.get("undo") and self.undo_stack:
+            entry = self.undo_stack.pop(); self.bytes -= _size(entry); self.redo_stack.append(entry)
+        elif rec.get("redo") and self.redo_stack: self._push(self.redo_stack.pop())
+
+    def load(self):
+        """Read the log, or re-read it if another process has written to it since."""
+        version = storage.file_version(self.path)
+        if self.loaded and version == self.version: return
+        self._reset()
+        self.loaded, self.version = True, version
+        if not os.path.exists(self.path): return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try: rec = json.loads(line)
+                except json.JSONDecodeError: break   # torn last line
+                self._apply_line(rec); self.log_lines += 1
+
+    def _log(self, rec):
+        """Apply and append one log line; returns the entry it moved (None if nothing to move)."""
+        with storage.locked():
+            self.load()
+            stack = self.undo_stack if rec.get("undo") else self.redo_stack
+            entry = rec.get("do") or (stack[-1] if stack else None)
+            if entry is None: return None
+            self._apply_line(rec)
+            if self.bytes > self.max_bytes:
+                self._compact()  # only an entry over the limit on its own is left (e.g. a bulk import): drop the rest from the log
+            else:
+                with open(self.path, "a", encoding="utf-8") as f: f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                self.log_lines += 1
+                if self.log_lines > 2 * (len(self.undo_stack) + len(self.redo_stack)) + 64: self._compact()
+            self.version = storage.file_version(self.path)
+            return entry
+
+    def _compact(self):
+        lines = [{"do": e} for e in self.undo_stack] + [{"do": e} for e in reversed(self.redo_stack)]
+        lines += [{"undo": 1}] * len(self.redo_stack)
+        storage.journal.write_lines(self.path, lines)
+        self.log_lines = len(lines)
+
+    # --- recording ---
+    def record(self, change, label):
+        """Add a change; inside group() it joins the group's entry."""
+        if self._paused: return
+        if self._group is not None: self._group["changes"].append(change); return
+        self._log({"do": {"label": label, "changes": [change]}})
+
+    @contextmanager
+    def group(self, label):
+        """Record every change made inside as one entry (undone and redone together).
+        If the block fails, its changes are not recorded."""
+        if self._group is not None or self._paused: yield; return
+        self._group = {"label": label, "changes": []}
+        try:
+            yield
+            entry = self._group
+        finally:
+            self._group = None
+        if entry["changes"]: self._log({"do": entry})
+
+    @contextmanager
+    def paused(self):
+        self._paused += 1
+        try: yield
+        finally: self._paused -= 1
+
+    # --- undo / redo ---
+    def peek_undo(self, n=1):
+        self.load(); return list(self.undo_stack)[-n:][::-1]
+
+    def peek_redo(self, n=1):
+        self.load(); return self.redo_stack[-n:][::-1]
+
+    def undo(self):
+        """Move the newest entry to the redo stack and return it (None if empty)."""
+        return self._log({"undo": 1})
+
+    def redo(self): return self._log({"redo": 1})
+
+    def _reset(self):
+        self.undo_stack.clear(); self.redo_stack.clear(); self.bytes = 0; self.log_lines = 0
+
+    def clear(self):
+        with storage.locked():
+            self._reset()
+            if os.path.exists(self.path): os.remove(self.path)
+            self.loaded, self.version = True, storage.file_version(self.path)